@@ -80,9 +80,52 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Concurrent review submits wait for the write lock instead of failing:
+            # transactions take it up front, and waiting writers give up only after 20s
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than in-memory test database, so threaded tests share it
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# File-based so cached responses and their invalidation are shared by all worker processes
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
     }
 }
 
+# Seconds a cached catalog/stats response may live; data changes invalidate it sooner
+KANJI_RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+# Spaced-repetition scheduler: 'legacy' (2 days per mastery level, up to 30), 'sm2' or 'fsrs'.
+# Options are passed to the scheduler, e.g. {'max_interval': 180} or {'retention': 0.85} for FSRS.
+# Run `python manage.py reschedule_reviews --migrate` after switching.
+KANJI_SCHEDULER = 'legacy'
+KANJI_SCHEDULER_OPTIONS = {}
+
+# Serve GET /api/review/ from an in-memory due queue instead of a query per request.
+# Changes made by other processes are picked up within KANJI_DUE_QUEUE_SYNC_SECONDS.
+KANJI_DUE_QUEUE = False
+KANJI_DUE_QUEUE_SYNC_SECONDS = 1.0
+
+# The in-memory meaning, reading and text indexes pick up catalog changes made by other
+# processes within KANJI_INDEX_SYNC_SECONDS (this process updates them as it writes).
+KANJI_INDEX_SYNC_SECONDS = 1.0
+
+# Days of review history kept by `python manage.py compact_review_log`
+KANJI_REVIEW_LOG_RETENTION_DAYS = 730
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kanji_tracker.settings')
 
 application = get_wsgi_application()
+
+# Seed the kanji catalog once per process, off the request path
+from learning.services.seeding import start_background_seed  # noqa: E402
+
+start_background_seed()
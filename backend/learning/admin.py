@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Kanji, KanjiReading, KanjiExample, KanjiReview
+from .models import DailyActivity, Kanji, KanjiReading, KanjiExample, KanjiReview, ReviewLog
 
 
 class KanjiReadingInline(admin.TabularInline):
@@ -25,3 +25,17 @@ class KanjiReviewAdmin(admin.ModelAdmin):
     list_display = ['kanji', 'mastery_level', 'next_review', 'review_count', 'correct_count']
     list_filter = ['mastery_level', 'next_review']
     search_fields = ['kanji__character', 'kanji__meaning']
+
+
+@admin.register(ReviewLog)
+class ReviewLogAdmin(admin.ModelAdmin):
+    list_display = ['kanji', 'reviewed_at', 'result', 'interval_before', 'interval_after', 'response_time_ms']
+    list_filter = ['result']
+    date_hierarchy = 'reviewed_at'
+    raw_id_fields = ['kanji']
+
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ['date', 'reviews', 'correct', 'new_cards', 'streak']
+    date_hierarchy = 'date'
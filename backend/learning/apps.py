@@ -6,7 +6,10 @@ class LearningConfig(AppConfig):
     name = 'learning'
     
     def ready(self):
-        """Auto-import kanji data from CSV files on startup if database is empty"""
+        """Connect signal handlers and start seeding kanji data from CSV files if database is empty"""
+        # Data-version bumps for the response cache
+        from . import signals  # noqa: F401
+        
         # Only run when Django is fully initialized (not during migrations)
         import sys
         
@@ -18,10 +21,5 @@ class LearningConfig(AppConfig):
         if os.environ.get('RUN_MAIN') != 'true':
             return
         
-        try:
-            from .utils import auto_import_kanji_data
-            auto_import_kanji_data(silent=True)
-        except Exception as e:
-            # Silently fail if there's an issue (e.g., during migrations, database not ready)
-            # In development, you might want to log this
-            pass
+        from .services.seeding import start_background_seed
+        start_background_seed()
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import DataVersion
+
+
+# Data-version scopes: which tables a cached response depends on
+CATALOG = 'catalog'  # Kanji, KanjiReading, KanjiExample
+REVIEWS = 'reviews'  # KanjiReview
+
+# Sent with `scopes` when a bulk operation (see deferred_version_bumps) changed data without
+# per-row signals, so in-process indexes know to rebuild instead of updating incrementally
+bulk_data_changed = Signal()
+
+_counters = {'hits': 0, 'misses': 0}
+_counters_lock = threading.Lock()
+_local = threading.local()
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def get_version_states(*scopes):
+    """Return {scope: (token, time of the last bump)} in one query, creating missing counters"""
+    def read():
+        return {
+            name: (token, updated_at)
+            for name, token, updated_at
+            in DataVersion.objects.filter(name__in=scopes).values_list('name', 'token', 'updated_at')
+        }
+    states = read()
+    missing = [scope for scope in scopes if scope not in states]
+    if missing:
+        DataVersion.objects.bulk_create(
+            [DataVersion(name=scope, token=_new_token()) for scope in missing],
+            ignore_conflicts=True
+        )
+        states = read()
+    return states
+
+
+def get_versions(*scopes):
+    """Return {scope: token} for the given scopes in one query, creating missing counters"""
+    return {scope: token for scope, (token, _) in get_version_states(*scopes).items()}
+
+
+def get_version_numbers(*scopes):
+    """Return {scope: version counter}; 0 for scopes that were never bumped"""
+    versions = dict(DataVersion.objects.filter(name__in=scopes).values_list('name', 'version'))
+    return {scope: versions.get(scope, 0) for scope in scopes}
+
+
+def bump_version(*scopes):
+    """Invalidate every cached response that depends on any of `scopes`"""
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        # Inside deferred_version_bumps(): bump once on exit instead of per row
+        pending.update(scopes)
+        return
+    now = timezone.now()
+    for scope in scopes:
+        updated = DataVersion.objects.filter(name=scope).update(
+            version=F('version') + 1, token=_new_token(), updated_at=now
+        )
+        if not updated:
+            DataVersion.objects.get_or_create(name=scope, defaults={'version': 1, 'token': _new_token()})
+
+
+def bumps_deferred():
+    """True inside deferred_version_bumps(), where bump_version() only collects scopes"""
+    return getattr(_local, 'pending', None) is not None
+
+
+@contextmanager
+def deferred_version_bumps(*scopes):
+    """
+    Collect the version bumps of a bulk operation (e.g. signals from a cascade delete)
+    and apply each scope once at the end. `scopes` are always bumped, for bulk writes
+    that send no signals at all.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # Nested: the outermost block does the bumping
+        _local.pending.update(scopes)
+        yield
+        return
+    _local.pending = set(scopes)
+    try:
+        yield
+    finally:
+        pending = _local.pending
+        _local.pending = None
+        if pending:
+            bump_version(*sorted(pending))
+            bulk_data_changed.send(sender=None, scopes=frozenset(pending))
+
+
+def _cache_key(endpoint, params, tokens):
+    params_key = '&'.join(f'{key}={value}' for key, value in sorted(params.items()))
+    versions_key = ','.join(f'{scope}:{token}' for scope, token in sorted(tokens.items()))
+    digest = hashlib.md5(f'{params_key}|{versions_key}'.encode('utf-8')).hexdigest()
+    return f'learning:{endpoint}:{digest}'
+
+
+def cached_data(endpoint, params, scopes, compute, versions=None):
+    """
+    Return `compute()` for this endpoint and set of filters, from the cache when the data
+    versions of `scopes` have not moved since it was stored. Pass `versions` when the
+    caller already read get_versions(*scopes).
+    """
+    key = _cache_key(endpoint, params, versions or get_versions(*scopes))
+    data = cache.get(key)
+    with _counters_lock:
+        _counters['hits' if data is not None else 'misses'] += 1
+    if data is None:
+        data = compute()
+        cache.set(key, data, getattr(settings, 'KANJI_RESPONSE_CACHE_TIMEOUT', 3600))
+    return data
+
+
+def cache_stats():
+    """Hit/miss counters of this process plus the current data versions"""
+    with _counters_lock:
+        hits, misses = _counters['hits'], _counters['misses']
+    total = hits + misses
+    versions = dict(DataVersion.objects.values_list('name', 'version'))
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else None,
+        'versions': versions,
+    }
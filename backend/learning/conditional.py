@@ -0,0 +1,35 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def catalog_validators(queryset, version_token='', version_updated_at=None):
+    """
+    Compute (etag, last_modified timestamp) for a kanji queryset in one aggregate query.
+    The ETag changes when any kanji in it is added, updated or deleted, and, through the
+    catalog's data-version token, when any of their readings or examples change.
+    Kanji.updated_at misses deletions and reading/example edits, so Last-Modified is the
+    later of it and the time of the catalog's last version bump (`version_updated_at`).
+    """
+    state = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    kanji_modified = state['last_modified']
+    last_modified = max(filter(None, (kanji_modified, version_updated_at)), default=None)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    token = f"{state['count']}|{kanji_modified.isoformat() if kanji_modified else ''}|{version_token}"
+    etag = quote_etag(hashlib.md5(token.encode('utf-8')).hexdigest())
+    return etag, timestamp
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response if the client's If-None-Match/If-Modified-Since is still current"""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    """Attach ETag/Last-Modified and ask clients to revalidate before reusing the response"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
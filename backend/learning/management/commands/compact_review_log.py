@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from learning.models import ReviewLog
+
+
+class Command(BaseCommand):
+    help = 'Delete review log entries older than the retention period, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'KANJI_REVIEW_LOG_RETENTION_DAYS', 730),
+            help='Keep entries from the last N days (default: settings.KANJI_REVIEW_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--keep-per-kanji',
+            type=int,
+            default=0,
+            help='Also keep the latest N entries of every kanji, however old (history for scheduler tuning)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement, so writers are never locked out for long (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count what would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['keep_per_kanji'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days and --keep-per-kanji must not be negative, --batch-size must be positive')
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = ReviewLog.objects.filter(reviewed_at__lt=cutoff)
+        keep = options['keep_per_kanji']
+        if keep:
+            # An entry is among its kanji's latest unless it is older than the keep-th newest
+            # one, read per entry along the (kanji, reviewed_at) index. Entries tied with that
+            # one are kept too.
+            kept_since = ReviewLog.objects.filter(
+                kanji_id=OuterRef('kanji_id')
+            ).order_by('-reviewed_at').values('reviewed_at')[keep - 1:keep]
+            expired = expired.filter(reviewed_at__lt=Subquery(kept_since))
+
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {expired.count()} review log entries from before {cutoff:%Y-%m-%d}')
+            return
+
+        # Each statement deletes within a range of batch_size ids, starting at the next expired one
+        batch_size = options['batch_size']
+        deleted = 0
+        start = expired.order_by('id').values_list('id', flat=True).first()
+        while start is not None:
+            deleted += expired.filter(id__gte=start, id__lt=start + batch_size).delete()[0]
+            start = expired.filter(id__gte=start + batch_size).order_by('id').values_list('id', flat=True).first()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} review log entries from before {cutoff:%Y-%m-%d}'
+        ))
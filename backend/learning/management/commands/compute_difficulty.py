@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from learning.services.difficulty import update_difficulties
+
+
+class Command(BaseCommand):
+    help = 'Recompute every kanji\'s difficulty from review accuracy, lapses and class level'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the new difficulty bands without writing them',
+        )
+        parser.add_argument(
+            '--every',
+            type=int,
+            metavar='SECONDS',
+            help='Keep running and recompute every SECONDS seconds (e.g. as a small worker process)',
+        )
+
+    def handle(self, *args, **options):
+        if options['every'] is not None and options['every'] < 1:
+            raise CommandError('--every must be at least 1 second')
+        while True:
+            self.run_once(options['dry_run'])
+            if options['every'] is None:
+                break
+            time.sleep(options['every'])
+            close_old_connections()
+
+    def run_once(self, dry_run):
+        started = time.perf_counter()
+        result = update_difficulties(dry_run=dry_run)
+        elapsed = time.perf_counter() - started
+        counts = ', '.join(f'{count} {band}' for band, count in result.counts.items())
+        verb = 'Would change' if dry_run else 'Changed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {result.changed} of {result.kanji} kanji ({counts}) in {elapsed:.2f}s'
+        ))
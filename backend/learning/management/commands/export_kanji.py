@@ -0,0 +1,45 @@
+import sys
+from django.core.management.base import BaseCommand
+from learning.services.export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, iter_export, iter_gzip
+
+
+class Command(BaseCommand):
+    help = 'Stream the whole kanji catalog (with readings and examples) as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=EXPORT_FORMATS,
+            default='ndjson',
+            help='Output format (default: ndjson)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File to write to (default: stdout)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip-compress the output',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Number of kanji read from the database at a time (default: {DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        chunks = iter_export(options['format'], chunk_size=options['chunk_size'])
+        data = iter_gzip(chunks) if options['gzip'] else (chunk.encode('utf-8') for chunk in chunks)
+        
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for block in data:
+                    f.write(block)
+            self.stderr.write(self.style.SUCCESS(f'Exported catalog to {options["output"]}'))
+        else:
+            for block in data:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
@@ -1,9 +1,10 @@
-import csv
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from learning.models import Kanji, KanjiReading, KanjiExample, KanjiReview
-from learning.utils import import_kanji_from_csv
+from learning.cache import deferred_version_bumps
+from learning.models import Kanji, ImportManifest
+from learning.services.importer import DEFAULT_BATCH_SIZE, import_csv_files, stream_import
+from learning.services.parsing import STREAM_FORMATS, detect_source_format, iter_source_records
 
 
 class Command(BaseCommand):
@@ -30,11 +31,53 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing kanji before importing',
         )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rewrite every row, ignoring the import manifest',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete kanji whose rows disappeared from the CSV since the last import',
+        )
+        parser.add_argument(
+            '--source',
+            type=str,
+            help='Stream a large dictionary source (CSV, TSV or KANJIDIC2-style XML) in batches',
+        )
+        parser.add_argument(
+            '--format',
+            choices=STREAM_FORMATS,
+            help='Format of --source (detected from the file extension by default)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Number of kanji committed per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parse class files in a pool of this many processes (0 = one per CPU core)',
+        )
 
     def handle(self, *args, **options):
+        # Validate before --clear, which cannot be undone
+        if options['batch_size'] < 1:
+            self.stdout.write(self.style.ERROR('--batch-size must be at least 1'))
+            return
+        if options['workers'] < 0:
+            self.stdout.write(self.style.ERROR('--workers must be 0 or more'))
+            return
+        
         if options['clear']:
             self.stdout.write('Clearing existing kanji...')
-            Kanji.objects.all().delete()
+            with deferred_version_bumps():
+                Kanji.objects.all().delete()
+            ImportManifest.objects.all().delete()
             self.stdout.write(self.style.SUCCESS('Cleared all kanji'))
 
         # Get the kanji_data directory path
@@ -46,21 +89,25 @@ class Command(BaseCommand):
             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
             kanji_data_dir = os.path.join(base_dir, 'kanji_data')
         
-        if options['all']:
+        if options['source']:
+            self.stream_source(options['source'], options)
+        elif options['all']:
             # Import all class files
+            files = []
             for class_num in range(1, 7):
                 filename = f'kanji_class_{class_num}.csv'
                 filepath = os.path.join(kanji_data_dir, filename)
                 if os.path.exists(filepath):
-                    self.import_csv(filepath, class_num)
+                    files.append((filepath, class_num))
                 else:
                     self.stdout.write(self.style.WARNING(f'File not found: {filepath}'))
+            self.import_files(files, options)
         elif options['class']:
             class_num = options['class']
             filename = f'kanji_class_{class_num}.csv'
             filepath = os.path.join(kanji_data_dir, filename)
             if os.path.exists(filepath):
-                self.import_csv(filepath, class_num)
+                self.import_files([(filepath, class_num)], options)
             else:
                 self.stdout.write(self.style.ERROR(f'File not found: {filepath}'))
         elif options['file']:
@@ -73,21 +120,70 @@ class Command(BaseCommand):
                 return
             
             if os.path.exists(filename):
-                self.import_csv(filename, class_num)
+                self.import_files([(filename, class_num)], options)
             else:
                 self.stdout.write(self.style.ERROR(f'File not found: {filename}'))
         else:
-            self.stdout.write(self.style.ERROR('Please specify --file, --class, or --all'))
+            self.stdout.write(self.style.ERROR('Please specify --file, --class, --all or --source'))
+
+    def import_files(self, files, options):
+        """Import kanji from class CSV files"""
+        if options['workers'] != 1 and len(files) > 1:
+            self.stdout.write(f'Parsing {len(files)} files with {options["workers"] or "all"} worker processes...')
+        
+        results = import_csv_files(
+            files,
+            workers=options['workers'] or None,
+            full=options['full'],
+            prune=options['prune'],
+            batch_size=options['batch_size'],
+        )
+        for filepath, class_num, result in results:
+            self.report(filepath, class_num, result, options)
 
-    def import_csv(self, filepath, class_num):
-        """Import kanji from a CSV file"""
-        self.stdout.write(f'Importing kanji from {os.path.basename(filepath)} (Class {class_num})...')
+    def report(self, filepath, class_num, result, options):
+        """Print the outcome of importing one CSV file"""
+        self.stdout.write(f'Imported kanji from {os.path.basename(filepath)} (Class {class_num})')
         
-        imported_count, skipped_count = import_kanji_from_csv(filepath, class_num, silent=False)
+        if result.file_skipped:
+            self.stdout.write(f'Unchanged since last import, skipped {result.unchanged} rows')
+            return
         
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully imported {imported_count} kanji, updated {skipped_count} existing kanji for Class {class_num}'
+                f'Successfully imported {result.created} kanji, updated {result.updated} existing kanji for Class {class_num} '
+                f'({result.rows} rows in {result.elapsed:.2f}s, {result.rows_per_second:.0f} rows/s, '
+                f'{result.unchanged} unchanged)'
             )
         )
+        
+        if result.missing:
+            action = f'Removed {result.removed} kanji' if options['prune'] else 'Use --prune to remove them'
+            self.stdout.write(
+                self.style.WARNING(
+                    f'{len(result.missing)} rows disappeared from the file: {", ".join(result.missing)}. {action}'
+                )
+            )
 
+    def stream_source(self, filepath, options):
+        """Stream a large source file into the database in fixed-size batches"""
+        if not os.path.exists(filepath):
+            self.stdout.write(self.style.ERROR(f'File not found: {filepath}'))
+            return
+        source_format = options['format'] or detect_source_format(filepath)
+        self.stdout.write(f'Streaming kanji from {os.path.basename(filepath)} ({source_format})...')
+        
+        def progress(result):
+            self.stdout.write(
+                f'  {result.rows} rows committed ({result.rows_per_second:.0f} rows/s)'
+            )
+        
+        records = iter_source_records(filepath, source_format, class_num=options['class'])
+        result = stream_import(records, batch_size=options['batch_size'], progress=progress)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully imported {result.created} kanji, updated {result.updated} existing kanji '
+                f'({result.rows} rows in {result.elapsed:.2f}s, {result.rows_per_second:.0f} rows/s)'
+            )
+        )
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from learning.services.activity import rebuild_activity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily activity rollups (reviews, accuracy, streaks) from the review log'
+
+    def handle(self, *args, **options):
+        days = rebuild_activity()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily activity for {days} days'))
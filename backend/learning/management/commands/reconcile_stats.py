@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from learning.services.stats import reconcile_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard stats snapshot from the tables and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the counters that drifted',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_snapshot(dry_run=options['dry_run'])
+        for field, (stored, counted) in drift.items():
+            self.stdout.write(f'{field}: {stored} -> {counted}')
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Stats snapshot is up to date'))
+        elif options['dry_run']:
+            self.stdout.write(f'Would repair {len(drift)} drifted counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(drift)} drifted counters'))
@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from learning.cache import REVIEWS, deferred_version_bumps
+from learning.models import KanjiReview
+from learning.services.scheduler import SCHEDULERS, STATE_FIELDS, get_scheduler
+
+
+COUNTER_FIELDS = ['mastery_level', 'review_count', 'correct_count', 'last_reviewed']
+
+
+class Command(BaseCommand):
+    help = 'Recompute next review dates of every reviewed card with a scheduler, in one pass over the table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scheduler',
+            choices=sorted(SCHEDULERS),
+            help='Scheduler to use (default: settings.KANJI_SCHEDULER)',
+        )
+        parser.add_argument(
+            '--migrate',
+            action='store_true',
+            help='Derive the scheduler\'s state from review counters first (after switching schedulers)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Cards loaded, computed and written per batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute everything but write nothing',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scheduler = get_scheduler(options['scheduler'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.perf_counter()
+        updated = 0
+        fields = ['next_review'] + (STATE_FIELDS if options['migrate'] else [])
+        reviews = KanjiReview.objects.filter(last_reviewed__isnull=False).order_by('id')
+        with transaction.atomic(), deferred_version_bumps(REVIEWS):
+            batch = []
+            for review in reviews.only('id', *COUNTER_FIELDS, *STATE_FIELDS).iterator(chunk_size=batch_size):
+                batch.append(review)
+                if len(batch) >= batch_size:
+                    updated += self.reschedule(scheduler, batch, fields, options)
+                    batch = []
+            if batch:
+                updated += self.reschedule(scheduler, batch, fields, options)
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        elapsed = time.perf_counter() - started
+        verb = 'Would reschedule' if options['dry_run'] else 'Rescheduled'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {updated} cards with the {scheduler.name} scheduler in {elapsed:.2f}s'
+        ))
+
+    def reschedule(self, scheduler, batch, fields, options):
+        """Compute one batch column-wise and write it back with a single bulk_update"""
+        columns = {field: [getattr(review, field) for review in batch] for field in COUNTER_FIELDS + STATE_FIELDS}
+        if options['migrate']:
+            columns.update(scheduler.initial_state(columns))
+        intervals = scheduler.next_intervals(columns)
+        for i, review in enumerate(batch):
+            for field in STATE_FIELDS:
+                setattr(review, field, columns[field][i])
+            review.next_review = review.last_reviewed + timedelta(days=max(intervals[i], 1))
+        if not options['dry_run']:
+            KanjiReview.objects.bulk_update(batch, fields)
+        return len(batch)
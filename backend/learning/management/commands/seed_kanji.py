@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from learning.services.seeding import ensure_seeded, get_seed_state
+
+
+class Command(BaseCommand):
+    help = 'Seed the database from the class CSV files if it is empty (one-time setup step)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parse class files in a pool of this many processes (0 = one per CPU core)',
+        )
+
+    def handle(self, *args, **options):
+        if ensure_seeded(silent=False, workers=options['workers'] or None):
+            state = get_seed_state()
+            if state['imported']:
+                self.stdout.write(self.style.SUCCESS('Seeded kanji data from CSV files'))
+            else:
+                self.stdout.write('Database already has kanji data, nothing to seed')
+        else:
+            self.stdout.write(self.style.ERROR(f'Seeding failed: {get_seed_state()["error"]}'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0002_alter_kanji_options_kanji_class_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_path', models.CharField(help_text='Absolute path of the imported file', max_length=500, unique=True)),
+                ('class_level', models.IntegerField(blank=True, null=True)),
+                ('file_hash', models.CharField(help_text='SHA-256 of the whole file', max_length=64)),
+                ('row_hashes', models.JSONField(default=dict, help_text='Character -> SHA-256 of the normalised row')),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0004_data_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kanji',
+            index=models.Index(fields=['class_level', 'character'], name='kanji_class_character_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kanjireview',
+            index=models.Index(fields=['next_review'], name='review_next_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kanjireview',
+            index=models.Index(fields=['mastery_level', 'next_review'], name='review_mastery_next_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kanjireview',
+            index=models.Index(fields=['review_count'], name='review_count_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:46
+
+from django.db import migrations, models
+
+
+def fill_interval_days(apps, schema_editor):
+    """
+    Reviews scheduled before this migration were scheduled by the legacy rule: store the
+    interval it set (the gap to next_review), or the mastery-based one where that gap is
+    unusable, so rescheduling without --migrate keeps existing schedules.
+    """
+    from learning.services.scheduler import STATE_FIELDS, LegacyScheduler
+
+    KanjiReview = apps.get_model('learning', 'KanjiReview')
+    scheduler = LegacyScheduler()
+
+    def fill(batch):
+        columns = {field: [0] * len(batch) for field in STATE_FIELDS}
+        columns['mastery_level'] = [review.mastery_level for review in batch]
+        derived = scheduler.initial_state(columns)['interval_days']
+        for review, interval in zip(batch, derived):
+            gap = round((review.next_review - review.last_reviewed).total_seconds() / 86400)
+            review.interval_days = gap if 1 <= gap <= scheduler.max_interval else interval
+        KanjiReview.objects.bulk_update(batch, ['interval_days'])
+
+    reviews = KanjiReview.objects.filter(last_reviewed__isnull=False).order_by('id')
+    batch = []
+    for review in reviews.only('id', 'mastery_level', 'last_reviewed', 'next_review').iterator(chunk_size=2000):
+        batch.append(review)
+        if len(batch) >= 2000:
+            fill(batch)
+            batch = []
+    if batch:
+        fill(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0005_review_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kanjireview',
+            name='ease_factor',
+            field=models.FloatField(default=2.5, help_text='SM-2 ease factor'),
+        ),
+        migrations.AddField(
+            model_name='kanjireview',
+            name='interval_days',
+            field=models.FloatField(default=0, help_text='Current review interval in days'),
+        ),
+        migrations.AddField(
+            model_name='kanjireview',
+            name='recall_difficulty',
+            field=models.FloatField(default=0, help_text='FSRS difficulty, 1-10'),
+        ),
+        migrations.AddField(
+            model_name='kanjireview',
+            name='stability',
+            field=models.FloatField(default=0, help_text='FSRS memory stability in days (0 = not learned yet)'),
+        ),
+        migrations.RunPython(fill_interval_days, migrations.RunPython.noop),
+    ]
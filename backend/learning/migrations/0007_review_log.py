@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0006_review_scheduler_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reviewed_at', models.DateTimeField()),
+                ('result', models.CharField(choices=[('correct', 'Correct'), ('hard', 'Hard'), ('incorrect', 'Incorrect')], max_length=10)),
+                ('interval_before', models.FloatField(help_text='Scheduled interval in days before this answer')),
+                ('interval_after', models.FloatField(help_text='Scheduled interval in days after this answer')),
+                ('response_time_ms', models.PositiveIntegerField(blank=True, help_text='Time taken to answer, if the client reported it', null=True)),
+                ('kanji', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='review_logs', to='learning.kanji')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reviewed_at'], name='reviewlog_reviewed_at_idx'), models.Index(fields=['kanji', 'reviewed_at'], name='reviewlog_kanji_reviewed_idx')],
+            },
+        ),
+    ]
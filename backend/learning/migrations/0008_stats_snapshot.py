@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0007_review_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_kanji', models.IntegerField(default=0)),
+                ('mastered', models.IntegerField(default=0)),
+                ('learning', models.IntegerField(default=0)),
+                ('total_mastery_points', models.BigIntegerField(default=0)),
+                ('mastery_levels', models.JSONField(default=dict, help_text='Mastery level -> number of reviews')),
+                ('classes', models.JSONField(default=dict, help_text="Class level ('none' for unclassified) -> total, reviewed, mastered, mastery_points")),
+                ('stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
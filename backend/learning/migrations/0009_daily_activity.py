@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0008_stats_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('reviews', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('new_cards', models.IntegerField(default=0, help_text='Answers to cards never reviewed before')),
+                ('streak', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'daily activity',
+                'ordering': ['date'],
+            },
+        ),
+    ]
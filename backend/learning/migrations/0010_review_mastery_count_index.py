@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0009_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kanjireview',
+            index=models.Index(fields=['mastery_level', 'review_count'], name='review_mastery_count_idx'),
+        ),
+    ]
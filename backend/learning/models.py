@@ -2,6 +2,15 @@ from django.db import models
 from django.utils import timezone
 
 
+class KanjiQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load readings and examples for every kanji in one query each, instead of per kanji"""
+        return self.prefetch_related(
+            models.Prefetch('readings', queryset=KanjiReading.objects.order_by('id')),
+            models.Prefetch('examples', queryset=KanjiExample.objects.order_by('id')),
+        )
+
+
 class Kanji(models.Model):
     """Model to store kanji characters and their information"""
     character = models.CharField(max_length=1, unique=True, help_text="The kanji character")
@@ -23,8 +32,14 @@ class Kanji(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = KanjiQuerySet.as_manager()
+    
     class Meta:
         ordering = ['class_level', 'character']
+        indexes = [
+            # Class filter and catalog ordering
+            models.Index(fields=['class_level', 'character'], name='kanji_class_character_idx'),
+        ]
     
     def __str__(self):
         return f"{self.character} - {self.meaning}"
@@ -67,9 +82,117 @@ class KanjiReview(models.Model):
     last_reviewed = models.DateTimeField(null=True, blank=True)
     review_count = models.IntegerField(default=0)
     correct_count = models.IntegerField(default=0)
+    # Scheduler state (see services.scheduler); each scheduler uses the fields it needs
+    interval_days = models.FloatField(default=0, help_text="Current review interval in days")
+    ease_factor = models.FloatField(default=2.5, help_text="SM-2 ease factor")
+    stability = models.FloatField(default=0, help_text="FSRS memory stability in days (0 = not learned yet)")
+    recall_difficulty = models.FloatField(default=0, help_text="FSRS difficulty, 1-10")
     
     class Meta:
         unique_together = ['kanji']
+        indexes = [
+            # Review queue: due cards by date, then the other cards by review count, each
+            # optionally within one mastery level (the table's id orders equal keys)
+            models.Index(fields=['next_review'], name='review_next_review_idx'),
+            models.Index(fields=['mastery_level', 'next_review'], name='review_mastery_next_idx'),
+            models.Index(fields=['review_count'], name='review_count_idx'),
+            models.Index(fields=['mastery_level', 'review_count'], name='review_mastery_count_idx'),
+        ]
     
     def __str__(self):
         return f"{self.kanji.character} - Level {self.mastery_level}"
+
+
+class ReviewLog(models.Model):
+    """Append-only history of review answers; KanjiReview only holds the current state"""
+    RESULTS = [
+        ('correct', 'Correct'),
+        ('hard', 'Hard'),
+        ('incorrect', 'Incorrect'),
+    ]
+    
+    # Covered by the (kanji, reviewed_at) index
+    kanji = models.ForeignKey(Kanji, on_delete=models.CASCADE, related_name='review_logs', db_index=False)
+    reviewed_at = models.DateTimeField()
+    result = models.CharField(max_length=10, choices=RESULTS)
+    interval_before = models.FloatField(help_text="Scheduled interval in days before this answer")
+    interval_after = models.FloatField(help_text="Scheduled interval in days after this answer")
+    response_time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Time taken to answer, if the client reported it")
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['reviewed_at'], name='reviewlog_reviewed_at_idx'),
+            models.Index(fields=['kanji', 'reviewed_at'], name='reviewlog_kanji_reviewed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kanji_id} - {self.result} at {self.reviewed_at}"
+
+
+class ImportManifest(models.Model):
+    """Fingerprints of an imported CSV file and each of its rows, used to skip unchanged data"""
+    source_path = models.CharField(max_length=500, unique=True, help_text="Absolute path of the imported file")
+    class_level = models.IntegerField(null=True, blank=True)
+    file_hash = models.CharField(max_length=64, help_text="SHA-256 of the whole file")
+    row_hashes = models.JSONField(default=dict, help_text="Character -> SHA-256 of the normalised row")
+    imported_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.source_path} ({len(self.row_hashes)} rows)"
+
+
+class DataVersion(models.Model):
+    """
+    Version counter for a group of tables, bumped whenever any of them changes.
+    Response caches key their entries on it, so a bump invalidates them in every process.
+    """
+    name = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    # Random per bump, so a rolled-back or reset counter never reuses a cache key
+    token = models.CharField(max_length=32, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class StatsSnapshot(models.Model):
+    """
+    Dashboard statistics kept up to date by deltas from the writers (see services/stats.py),
+    so the dashboard reads one row instead of aggregating the tables. There is a single row;
+    `stale` marks it for a full recount on the next read, and the reconcile_stats command
+    recounts it on demand.
+    """
+    total_kanji = models.IntegerField(default=0)
+    mastered = models.IntegerField(default=0)
+    learning = models.IntegerField(default=0)
+    total_mastery_points = models.BigIntegerField(default=0)
+    mastery_levels = models.JSONField(default=dict, help_text="Mastery level -> number of reviews")
+    classes = models.JSONField(
+        default=dict, help_text="Class level ('none' for unclassified) -> total, reviewed, mastered, mastery_points"
+    )
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Stats: {self.mastered}/{self.total_kanji} mastered{' (stale)' if self.stale else ''}"
+
+
+class DailyActivity(models.Model):
+    """
+    Review answers rolled up per day (in settings.TIME_ZONE), maintained on every submit.
+    `streak` is the number of consecutive days with answers ending on this day, so the
+    current streak is read from one row instead of walking the history.
+    """
+    date = models.DateField(unique=True)
+    reviews = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    new_cards = models.IntegerField(default=0, help_text="Answers to cards never reviewed before")
+    streak = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'daily activity'
+    
+    def __str__(self):
+        return f"{self.date}: {self.correct}/{self.reviews} correct"
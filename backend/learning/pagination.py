@@ -0,0 +1,79 @@
+import base64
+import json
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KanjiKeysetPagination(BasePagination):
+    """
+    Cursor pagination over kanji dict rows (see kanji_values()) ordered by
+    (class_level, character), like Kanji.Meta.ordering.
+    Each page continues strictly after the last row of the previous one, so fetching a page
+    costs the same no matter how deep into the catalog it is. Pagination only applies when
+    the client asks for it with `page_size` or `cursor`; otherwise the whole list is returned.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    default_page_size = 100
+    max_page_size = 1000
+    # class_level is nullable; pin NULLs first so the keyset comparison is the same on every database
+    ordering = (F('class_level').asc(nulls_first=True), 'character')
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.page_size_query_param in params or self.cursor_query_param in params
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.default_page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be a number.'})
+        if page_size < 1:
+            raise ValidationError({'page_size': 'Must be at least 1.'})
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(row):
+        payload = json.dumps([row['class_level'], row['character']], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            class_level, character = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError, UnicodeError):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        if (class_level is not None and not isinstance(class_level, int)) or not isinstance(character, str):
+            raise ValidationError({'cursor': 'Invalid cursor.'})
+        return class_level, character
+
+    def after(self, class_level, character):
+        """Filter for rows that sort after (class_level, character), NULL class levels first"""
+        if class_level is None:
+            return Q(class_level__isnull=True, character__gt=character) | Q(class_level__isnull=False)
+        return Q(class_level=class_level, character__gt=character) | Q(class_level__gt=class_level)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(*self.decode_cursor(cursor)))
+
+        # Fetch one extra row to know whether there is a next page
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next_cursor': self.next_cursor,
+            'results': data
+        })
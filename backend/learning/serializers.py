@@ -1,3 +1,4 @@
+from collections import defaultdict
 from rest_framework import serializers
 from .models import Kanji, KanjiReading, KanjiExample, KanjiReview
 
@@ -15,7 +16,7 @@ class KanjiExampleSerializer(serializers.ModelSerializer):
 
 
 class KanjiSerializer(serializers.ModelSerializer):
-    readings = KanjiReadingSerializer(many=True, read_only=True)
+    readings = serializers.SerializerMethodField()
     examples = KanjiExampleSerializer(many=True, read_only=True)
     
     # For input, we'll accept readings and examples as nested data
@@ -82,19 +83,72 @@ class KanjiSerializer(serializers.ModelSerializer):
         
         return kanji
     
-    def to_representation(self, instance):
-        """Custom representation to match frontend expected format"""
-        representation = super().to_representation(instance)
-        
-        # Group readings by type
+    def get_readings(self, instance):
+        """Group readings by type to match frontend expected format"""
+        # Uses the prefetched readings when the queryset comes from Kanji.objects.with_related()
         readings_dict = {'onyomi': [], 'kunyomi': []}
         for reading in instance.readings.all():
             if reading.reading_type == 'onyomi':
                 readings_dict['onyomi'].append(reading.reading)
             else:
                 readings_dict['kunyomi'].append(reading.reading)
-        
-        representation['readings'] = readings_dict
-        
-        return representation
+        return readings_dict
+
+
+# Read-only fast path: the same JSON as KanjiSerializer(..., many=True).data,
+# built from values() rows without per-field serializer machinery
+KANJI_VALUE_FIELDS = ('id', 'character', 'meaning', 'class_level', 'difficulty', 'created_at')
+
+_created_at_field = serializers.DateTimeField()
+
+
+def kanji_values(queryset):
+    """The kanji columns serialize_kanji_rows() needs, as dict rows"""
+    return queryset.values(*KANJI_VALUE_FIELDS)
+
+
+def serialize_kanji_rows(rows):
+    """
+    Serialize kanji dict rows (see kanji_values()) for read-only responses.
+    Readings and examples for all rows are loaded in one query each and grouped in one pass.
+    Accepts a values() queryset or an already evaluated list of rows.
+    """
+    if hasattr(rows, 'query') and not rows.query.is_sliced:
+        # Let the database resolve the kanji ids instead of sending them back as parameters
+        kanji_filter = {'kanji_id__in': rows.order_by().values('id')}
+        rows = list(rows)
+    else:
+        rows = list(rows)
+        kanji_filter = {'kanji_id__in': [row['id'] for row in rows]}
+    if not rows:
+        return []
+
+    readings = {}
+    reading_rows = KanjiReading.objects.filter(**kanji_filter).order_by('id').values_list(
+        'kanji_id', 'reading', 'reading_type'
+    )
+    for kanji_id, reading, reading_type in reading_rows:
+        grouped = readings.setdefault(kanji_id, {'onyomi': [], 'kunyomi': []})
+        grouped['onyomi' if reading_type == 'onyomi' else 'kunyomi'].append(reading)
+
+    examples = defaultdict(list)
+    example_rows = KanjiExample.objects.filter(**kanji_filter).order_by('id').values_list(
+        'kanji_id', 'japanese', 'reading', 'meaning'
+    )
+    for kanji_id, japanese, reading, meaning in example_rows:
+        examples[kanji_id].append({'japanese': japanese, 'reading': reading, 'meaning': meaning})
 
+    to_datetime = _created_at_field.to_representation
+    return [
+        {
+            'id': row['id'],
+            'character': row['character'],
+            'meaning': row['meaning'],
+            'class_level': row['class_level'],
+            'difficulty': row['difficulty'],
+            'readings': readings.get(row['id']) or {'onyomi': [], 'kunyomi': []},
+            'examples': examples.get(row['id'], []),
+            'created_at': to_datetime(row['created_at']),
+        }
+        for row in rows
+    ]
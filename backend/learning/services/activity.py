@@ -0,0 +1,120 @@
+"""
+Daily activity rollups: answers, correct answers and new cards per day.
+
+Submits add their answers to the day's DailyActivity row in their own transaction. Each row
+also carries the streak ending on its day, fixed up when a day is first written, so the
+dashboard reads streak, heatmap and accuracy from one bounded range of rows and never
+looks at the review log.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import DailyActivity, ReviewLog
+
+
+HEATMAP_DAYS = 365
+ACCURACY_WINDOWS = (7, 30)
+
+
+def record_answers(answers):
+    """
+    Add answers, given as (reviewed_at, result, new card?) tuples, to their days' rollups.
+    Call inside the submit's transaction: one UPDATE per day, more only for a day's first answer.
+    """
+    days = defaultdict(lambda: [0, 0, 0])
+    for reviewed_at, result, new_card in answers:
+        counts = days[timezone.localdate(reviewed_at)]
+        counts[0] += 1
+        counts[1] += result == 'correct'
+        counts[2] += bool(new_card)
+    for day, (reviews, correct, new_cards) in sorted(days.items()):
+        increments = {
+            'reviews': F('reviews') + reviews,
+            'correct': F('correct') + correct,
+            'new_cards': F('new_cards') + new_cards,
+        }
+        if DailyActivity.objects.filter(date=day).update(**increments):
+            continue
+        _, created = DailyActivity.objects.get_or_create(date=day)
+        DailyActivity.objects.filter(date=day).update(**increments)
+        if created:
+            update_streaks(day)
+
+
+def update_streaks(day):
+    """
+    Set the streak of the row for `day` and of the run of consecutive days following it.
+    For today's first answer that is the one row; filling a gap (e.g. an offline batch)
+    renumbers the run it joins.
+    """
+    previous = DailyActivity.objects.filter(date=day - timedelta(days=1)).values_list('streak', flat=True).first()
+    streak = previous or 0
+    expected = day
+    for activity in DailyActivity.objects.filter(date__gte=day).order_by('date').only('date', 'streak').iterator():
+        if activity.date != expected:
+            break
+        streak += 1
+        if activity.streak != streak:
+            DailyActivity.objects.filter(pk=activity.pk).update(streak=streak)
+        expected += timedelta(days=1)
+
+
+def _accuracy(rows):
+    reviews = sum(row['reviews'] for row in rows)
+    correct = sum(row['correct'] for row in rows)
+    return round(correct / reviews * 100, 1) if reviews else None
+
+
+def activity_stats(today=None, heatmap_days=HEATMAP_DAYS):
+    """Streak, accuracy over the last 7 and 30 days and a heatmap, from one range query"""
+    today = today or timezone.localdate()
+    window = max(heatmap_days, *ACCURACY_WINDOWS)
+    rows = list(DailyActivity.objects.filter(
+        date__gt=today - timedelta(days=window), date__lte=today
+    ).order_by('date').values('date', 'reviews', 'correct', 'new_cards', 'streak'))
+    by_date = {row['date']: row for row in rows}
+
+    # A streak is not broken until a whole day passes without answers
+    current = by_date.get(today) or by_date.get(today - timedelta(days=1))
+    stats = {'streak': current['streak'] if current else 0}
+    for days in ACCURACY_WINDOWS:
+        stats[f'accuracy_{days}d'] = _accuracy([row for row in rows if row['date'] > today - timedelta(days=days)])
+    stats['heatmap'] = [
+        {
+            'date': row['date'].isoformat(),
+            'reviews': row['reviews'],
+            'correct': row['correct'],
+            'new_cards': row['new_cards'],
+        }
+        for row in rows if row['date'] > today - timedelta(days=heatmap_days)
+    ]
+    return stats
+
+
+def rebuild_activity():
+    """
+    Recompute every rollup from the review log, e.g. to backfill history recorded before
+    rollups existed. A kanji's earliest logged answer counts as its new card, so history
+    removed by compact_review_log is missing here too. Returns the number of days.
+    """
+    days = defaultdict(lambda: {'reviews': 0, 'correct': 0, 'new_cards': 0})
+    per_day = ReviewLog.objects.order_by().annotate(
+        day=TruncDate('reviewed_at', tzinfo=timezone.get_current_timezone())
+    ).values('day').annotate(reviews=Count('id'), correct=Count('id', filter=Q(result='correct')))
+    for row in per_day:
+        days[row['day']].update(reviews=row['reviews'], correct=row['correct'])
+    for first in ReviewLog.objects.order_by().values('kanji_id').annotate(first=Min('reviewed_at')).values_list('first', flat=True):
+        days[timezone.localdate(first)]['new_cards'] += 1
+
+    streak = 0
+    activities = []
+    for day in sorted(days):
+        streak = streak + 1 if activities and activities[-1].date == day - timedelta(days=1) else 1
+        activities.append(DailyActivity(date=day, streak=streak, **days[day]))
+    with transaction.atomic():
+        DailyActivity.objects.all().delete()
+        DailyActivity.objects.bulk_create(activities)
+    return len(activities)
@@ -0,0 +1,110 @@
+"""
+Batch difficulty engine: derives Kanji.difficulty from how learners actually do.
+
+All inputs come from one aggregate query over the catalog; scores are computed column by
+column over the whole table and only changed rows are written back, with bulk_update.
+Run it from the compute_difficulty management command, never per request.
+"""
+from dataclasses import dataclass, field
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from ..cache import CATALOG, deferred_version_bumps
+from ..models import Kanji, ReviewLog
+
+
+CLASS_LEVELS = 6
+# Answers the class-level prior counts as, when smoothing a kanji's own record
+PRIOR_WEIGHT = 5
+# Weights of the score's components: error rate, lapse rate, class level
+ERROR_WEIGHT = 0.6
+LAPSE_WEIGHT = 0.25
+CLASS_WEIGHT = 0.15
+# Score bands
+EASY_BELOW = 0.15
+HARD_FROM = 0.35
+
+
+@dataclass
+class DifficultyResult:
+    kanji: int = 0
+    changed: int = 0
+    counts: dict = field(default_factory=dict)
+
+
+def _class_prior(class_level):
+    """0 for class 1 up to 1 for class 6; kanji without a class sit in the middle"""
+    if class_level is None:
+        return 0.5
+    return min(1.0, max(0.0, (class_level - 1) / (CLASS_LEVELS - 1)))
+
+
+def load_columns():
+    """One query: per kanji its class level, review and correct counts and lapses, as columns"""
+    lapses = ReviewLog.objects.filter(
+        kanji=OuterRef('pk'), result='incorrect', interval_before__gt=0
+    ).order_by().values('kanji').annotate(count=Count('id')).values('count')
+    rows = Kanji.objects.order_by().annotate(
+        review_total=Coalesce(Sum('reviews__review_count'), 0),
+        correct_total=Coalesce(Sum('reviews__correct_count'), 0),
+        lapse_total=Coalesce(Subquery(lapses, output_field=IntegerField()), Value(0)),
+    ).values_list('id', 'class_level', 'difficulty', 'review_total', 'correct_total', 'lapse_total')
+    names = ('id', 'class_level', 'difficulty', 'reviews', 'correct', 'lapses')
+    columns = {name: [] for name in names}
+    for row in rows:
+        for name, value in zip(names, row):
+            columns[name].append(value)
+    return columns
+
+
+def compute_scores(columns):
+    """
+    Difficulty score (roughly 0-1) per kanji. A kanji's error and lapse rates are smoothed
+    towards what its class level predicts, so a few answers move it a little and many move it
+    a lot; never-reviewed kanji get the class-level estimate.
+    """
+    prior = [_class_prior(class_level) for class_level in columns['class_level']]
+    prior_error = [0.1 + 0.3 * p for p in prior]
+    prior_lapse = [0.05 + 0.15 * p for p in prior]
+    error = [
+        ((reviews - correct) + PRIOR_WEIGHT * expected) / (reviews + PRIOR_WEIGHT)
+        for reviews, correct, expected in zip(columns['reviews'], columns['correct'], prior_error)
+    ]
+    lapse = [
+        (lapses + PRIOR_WEIGHT * expected) / (reviews + PRIOR_WEIGHT)
+        for reviews, lapses, expected in zip(columns['reviews'], columns['lapses'], prior_lapse)
+    ]
+    return [
+        ERROR_WEIGHT * e + LAPSE_WEIGHT * min(1.0, l) + CLASS_WEIGHT * p
+        for e, l, p in zip(error, lapse, prior)
+    ]
+
+
+def difficulty_band(score):
+    if score < EASY_BELOW:
+        return 'easy'
+    if score >= HARD_FROM:
+        return 'hard'
+    return 'medium'
+
+
+def update_difficulties(dry_run=False, batch_size=1000):
+    """Recompute every kanji's difficulty and write back the ones that changed"""
+    columns = load_columns()
+    bands = [difficulty_band(score) for score in compute_scores(columns)]
+    result = DifficultyResult(kanji=len(bands))
+    for band in ('easy', 'medium', 'hard'):
+        result.counts[band] = bands.count(band)
+
+    now = timezone.now()
+    changed = [
+        Kanji(id=kanji_id, difficulty=band, updated_at=now)
+        for kanji_id, current, band in zip(columns['id'], columns['difficulty'], bands)
+        if current != band
+    ]
+    result.changed = len(changed)
+    if changed and not dry_run:
+        # bulk_update skips auto_now, so updated_at is set explicitly for the catalog validators
+        with deferred_version_bumps(CATALOG):
+            Kanji.objects.bulk_update(changed, ['difficulty', 'updated_at'], batch_size=batch_size)
+    return result
@@ -0,0 +1,178 @@
+import heapq
+import threading
+import time
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..cache import CATALOG, REVIEWS, get_version_numbers
+from ..models import KanjiReview
+from .review_selector import DUE, FALLBACK, NEW, REVIEW_FIELDS
+
+
+class DueQueue:
+    """
+    Optional in-memory review queue (settings.KANJI_DUE_QUEUE) that answers like
+    select_review_cards() without touching the database.
+
+    Every KanjiReview row is loaded once. For each class/mastery filter asked for, two heaps
+    are built in the selector's orders: due cards (next_review, id) and all cards
+    (review_count, id). Submits in this process update it write-through; any other change to
+    the catalog or reviews shows up in the data versions, checked at most every
+    KANJI_DUE_QUEUE_SYNC_SECONDS, and triggers a reload.
+
+    Heap entries are never updated in place: a changed card gets a new revision and fresh
+    entries. Entries of older revisions are dropped when they reach the top, and a heap is
+    rebuilt without them once they outnumber half of its live entries, so it stays bounded
+    however many submits it sees between reloads.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self._loaded = False
+        self._cards = {}  # kanji_id -> review row (with class_level and revision)
+        self._heaps = {}  # (class_level, mastery_level) -> [due, all]
+        self._stale = {}  # (class_level, mastery_level) -> superseded entries in each heap
+        self._versions = {}
+        self._checked_at = 0.0
+        self._revision = 0
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'KANJI_DUE_QUEUE', False)
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    def load(self):
+        with self._lock:
+            self.clear()
+            self._versions = get_version_numbers(CATALOG, REVIEWS)
+            for row in KanjiReview.objects.order_by().values(*REVIEW_FIELDS, class_level=F('kanji__class_level')):
+                self._add_card(row)
+            self._checked_at = time.monotonic()
+            self._loaded = True
+
+    def _add_card(self, row):
+        self._revision += 1
+        row['revision'] = self._revision
+        self._cards[row['kanji_id']] = row
+        return row
+
+    @staticmethod
+    def _matches(row, key):
+        class_level, mastery_level = key
+        return ((class_level is None or row['class_level'] == class_level)
+                and (mastery_level is None or row['mastery_level'] == mastery_level))
+
+    def _is_current(self, entry):
+        *_, kanji_id, revision = entry
+        row = self._cards.get(kanji_id)
+        return row is not None and row['revision'] == revision
+
+    @staticmethod
+    def _entries(row):
+        """Heap entries of a card for the due and all heaps"""
+        entry = (row['id'], row['kanji_id'], row['revision'])
+        return (row['next_review'],) + entry, (row['review_count'],) + entry
+
+    def _heaps_for(self, key):
+        heaps = self._heaps.get(key)
+        if heaps is None:
+            heaps = [[], []]
+            for row in self._cards.values():
+                if self._matches(row, key):
+                    for heap, entry in zip(heaps, self._entries(row)):
+                        heap.append(entry)
+            for heap in heaps:
+                heapq.heapify(heap)
+            self._heaps[key] = heaps
+            self._stale[key] = [0] * len(heaps)
+        return heaps
+
+    def _compact(self, key):
+        """Rebuild the heaps of `key` whose superseded entries exceed half of their live ones"""
+        stale = self._stale[key]
+        for index, heap in enumerate(self._heaps[key]):
+            if stale[index] * 2 > len(heap) - stale[index]:
+                heap[:] = [entry for entry in heap if self._is_current(entry)]
+                heapq.heapify(heap)
+                stale[index] = 0
+
+    def _sync(self):
+        """Reload when anything changed that write-through did not see"""
+        if not self._loaded:
+            self.load()
+            return
+        interval = getattr(settings, 'KANJI_DUE_QUEUE_SYNC_SECONDS', 1.0)
+        if time.monotonic() - self._checked_at >= interval:
+            if get_version_numbers(CATALOG, REVIEWS) != self._versions:
+                self.load()
+            else:
+                self._checked_at = time.monotonic()
+
+    def review_updated(self, review, reviews_version):
+        """
+        Write-through for a submit that moved the reviews version to `reviews_version`.
+        If the queue missed a change in between, it reloads on next use instead.
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            if self._versions.get(REVIEWS) != reviews_version - 1 or review.kanji_id not in self._cards:
+                self.clear()
+                return
+            self._versions[REVIEWS] = reviews_version
+            previous = self._cards[review.kanji_id]
+            row = {field: getattr(review, field) for field in REVIEW_FIELDS}
+            row = self._add_card({**row, 'class_level': previous['class_level']})
+            for key, heaps in self._heaps.items():
+                if self._matches(row, key):
+                    for heap, entry in zip(heaps, self._entries(row)):
+                        heapq.heappush(heap, entry)
+                if self._matches(previous, key):
+                    self._stale[key] = [count + 1 for count in self._stale[key]]
+                    self._compact(key)
+
+    def select(self, limit=1, class_level=None, mastery_level=None, exclude_kanji=(), now=None):
+        """Same contract as review_selector.select_review_cards()"""
+        now = now or timezone.now()
+        excluded = set(exclude_kanji)
+        with self._lock:
+            self._sync()
+            key = (class_level, mastery_level)
+            heaps = self._heaps_for(key)
+            stale = self._stale[key]
+            selected = []
+            seen = set()
+            for index, (due, heap) in enumerate(zip((True, False), heaps)):
+                popped = []
+                while heap and len(selected) < limit:
+                    entry = heap[0]
+                    if not self._is_current(entry):
+                        # Superseded by a later update of the card
+                        heapq.heappop(heap)
+                        stale[index] -= 1
+                        continue
+                    kanji_id = entry[-2]
+                    row = self._cards[kanji_id]
+                    if due and row['next_review'] > now:
+                        break
+                    popped.append(heapq.heappop(heap))
+                    if kanji_id in seen or kanji_id in excluded:
+                        continue
+                    seen.add(kanji_id)
+                    priority = DUE if due else NEW if row['review_count'] == 0 else FALLBACK
+                    selected.append({**{field: row[field] for field in REVIEW_FIELDS}, 'priority': priority})
+                # Selecting does not consume cards; only submits move them
+                for entry in popped:
+                    heapq.heappush(heap, entry)
+                if len(selected) >= limit:
+                    break
+            return selected
+
+
+due_queue = DueQueue()
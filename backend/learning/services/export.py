@@ -0,0 +1,90 @@
+import csv
+import json
+import zlib
+from ..models import Kanji
+from .parsing import EXAMPLE_FIELD_SEPARATOR, EXAMPLE_SEPARATOR, READING_SEPARATOR
+
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CSV_COLUMNS = ['character', 'meaning', 'onyomi', 'kunyomi', 'example', 'class_level']
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def iter_catalog(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Iterate over every kanji with its readings and examples, `chunk_size` kanji at a time.
+    Readings and examples are prefetched per chunk, so memory does not grow with the catalog.
+    """
+    return Kanji.objects.with_related().iterator(chunk_size=chunk_size)
+
+
+def export_record(kanji):
+    """Plain dict for one kanji, including readings and examples"""
+    onyomi = []
+    kunyomi = []
+    for reading in kanji.readings.all():
+        (onyomi if reading.reading_type == 'onyomi' else kunyomi).append(reading.reading)
+    return {
+        'id': kanji.id,
+        'character': kanji.character,
+        'meaning': kanji.meaning,
+        'class_level': kanji.class_level,
+        'difficulty': kanji.difficulty,
+        'onyomi': onyomi,
+        'kunyomi': kunyomi,
+        'examples': [
+            {'japanese': example.japanese, 'reading': example.reading, 'meaning': example.meaning}
+            for example in kanji.examples.all()
+        ],
+        'updated_at': kanji.updated_at.isoformat(),
+    }
+
+
+def iter_ndjson(kanji_iter):
+    """One JSON object per line"""
+    for kanji in kanji_iter:
+        yield json.dumps(export_record(kanji), ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer can feed a generator"""
+    def write(self, value):
+        return value
+
+
+def iter_csv(kanji_iter):
+    """CSV in the class file layout (plus class_level), so it can be re-imported with --source"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for kanji in kanji_iter:
+        record = export_record(kanji)
+        examples = EXAMPLE_SEPARATOR.join(
+            EXAMPLE_FIELD_SEPARATOR.join((example['japanese'], example['reading'], example['meaning']))
+            for example in record['examples']
+        )
+        yield writer.writerow([
+            record['character'],
+            record['meaning'],
+            READING_SEPARATOR.join(record['onyomi']),
+            READING_SEPARATOR.join(record['kunyomi']),
+            examples,
+            '' if record['class_level'] is None else record['class_level'],
+        ])
+
+
+def iter_export(export_format='ndjson', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the whole catalog as text chunks in the given format"""
+    kanji_iter = iter_catalog(chunk_size=chunk_size)
+    if export_format == 'csv':
+        return iter_csv(kanji_iter)
+    return iter_ndjson(kanji_iter)
+
+
+def iter_gzip(chunks):
+    """Gzip-compress a stream of text chunks without buffering the whole output"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,346 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from django.db import transaction
+from django.utils import timezone
+from ..cache import CATALOG, REVIEWS, deferred_version_bumps
+from ..models import Kanji, KanjiReading, KanjiExample, KanjiReview, ImportManifest
+from .parsing import file_fingerprint, parse_csv_file, row_fingerprint
+from .stats import StatsDelta, apply_delta
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+@dataclass
+class ImportResult:
+    """Counters collected while writing a set of parsed kanji records"""
+    created: int = 0
+    updated: int = 0
+    rows: int = 0
+    elapsed: float = 0.0
+    unchanged: int = 0
+    file_skipped: bool = False
+    # Characters that were in the previous import of a file but are gone from it now
+    missing: list = field(default_factory=list)
+    removed: int = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def merge(self, other):
+        self.created += other.created
+        self.updated += other.updated
+        self.rows += other.rows
+        self.elapsed += other.elapsed
+        self.unchanged += other.unchanged
+        self.missing.extend(other.missing)
+        self.removed += other.removed
+        return self
+
+
+def _dedupe(records):
+    """Keep the last record per character, matching the old row-by-row overwrite order"""
+    by_character = {}
+    for record in records:
+        by_character.pop(record['character'], None)
+        by_character[record['character']] = record
+    return list(by_character.values())
+
+
+def write_kanji_batch(records):
+    """
+    Write one batch of kanji records with set-based queries.
+    Existing kanji are updated and get their readings/examples replaced,
+    new kanji are created together with their initial review entry.
+    `meaning`, `class_level` or `examples` set to None means the source does not provide
+    them: existing kanji keep what they have, new kanji get an empty value.
+    """
+    # Bulk writes send no signals, so bump the cache data versions once for the batch
+    with deferred_version_bumps(CATALOG, REVIEWS):
+        return _write_kanji_batch(records)
+
+
+def _write_kanji_batch(records):
+    records = _dedupe(records)
+    result = ImportResult(rows=len(records))
+    if not records:
+        return result
+
+    now = timezone.now()
+    characters = [record['character'] for record in records]
+    existing = Kanji.objects.in_bulk(characters, field_name='character')
+
+    to_create = []
+    to_update = []
+    delta = StatsDelta()
+    moved = {}  # kanji_id -> previous class level, for kanji that changed class
+    for record in records:
+        kanji = existing.get(record['character'])
+        if kanji is None:
+            to_create.append(Kanji(
+                character=record['character'],
+                meaning=record['meaning'] or '',
+                class_level=record['class_level'],
+                difficulty='medium'
+            ))
+            delta.kanji(record['class_level'])
+        else:
+            class_level = kanji.class_level if record['class_level'] is None else record['class_level']
+            if kanji.class_level != class_level:
+                moved[kanji.id] = kanji.class_level
+                delta.kanji(kanji.class_level, sign=-1)
+                delta.kanji(class_level)
+            if record['meaning'] is not None:
+                kanji.meaning = record['meaning']
+            kanji.class_level = class_level
+            # bulk_update() bypasses auto_now, so set it explicitly
+            kanji.updated_at = now
+            to_update.append(kanji)
+
+    if to_update:
+        Kanji.objects.bulk_update(to_update, ['meaning', 'class_level', 'updated_at'])
+        updated_ids = [kanji.id for kanji in to_update]
+        KanjiReading.objects.filter(kanji_id__in=updated_ids).delete()
+        with_examples = {record['character'] for record in records if record['examples'] is not None}
+        KanjiExample.objects.filter(
+            kanji_id__in=[kanji.id for kanji in to_update if kanji.character in with_examples]
+        ).delete()
+
+    if to_create:
+        Kanji.objects.bulk_create(to_create)
+        created = Kanji.objects.in_bulk(
+            [kanji.character for kanji in to_create], field_name='character'
+        )
+        existing.update(created)
+
+    readings = []
+    examples = []
+    for record in records:
+        kanji = existing[record['character']]
+        for reading_type in ('onyomi', 'kunyomi'):
+            for reading in record[reading_type]:
+                readings.append(KanjiReading(kanji_id=kanji.id, reading=reading, reading_type=reading_type))
+        seen_japanese = set()
+        for example in record['examples'] or []:
+            # Examples used to be get_or_create'd by (kanji, japanese)
+            if example['japanese'] in seen_japanese:
+                continue
+            seen_japanese.add(example['japanese'])
+            examples.append(KanjiExample(kanji_id=kanji.id, **example))
+
+    KanjiReading.objects.bulk_create(readings, batch_size=DEFAULT_BATCH_SIZE)
+    KanjiExample.objects.bulk_create(examples, batch_size=DEFAULT_BATCH_SIZE)
+
+    class_levels = {kanji.id: kanji.class_level for kanji in existing.values()}
+    reviewed = set()
+    for kanji_id, mastery_level, review_count in KanjiReview.objects.filter(
+        kanji_id__in=list(class_levels)
+    ).values_list('kanji_id', 'mastery_level', 'review_count'):
+        reviewed.add(kanji_id)
+        if kanji_id in moved:
+            # The review's counts move to the kanji's new class
+            delta.review(moved[kanji_id], mastery_level, review_count, sign=-1)
+            delta.review(class_levels[kanji_id], mastery_level, review_count)
+    new_reviews = [KanjiReview(kanji_id=kanji_id) for kanji_id in class_levels if kanji_id not in reviewed]
+    KanjiReview.objects.bulk_create(new_reviews, batch_size=DEFAULT_BATCH_SIZE)
+    for review in new_reviews:
+        delta.review(class_levels[review.kanji_id], review.mastery_level, review.review_count)
+    apply_delta(delta)
+
+    result.created = len(to_create)
+    result.updated = len(to_update)
+    return result
+
+
+def bulk_import_records(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Write parsed kanji records in one transaction, `batch_size` kanji per round of queries"""
+    result = ImportResult()
+    started = time.perf_counter()
+    records = _dedupe(records)
+    with transaction.atomic():
+        for start in range(0, len(records), batch_size):
+            result.merge(write_kanji_batch(records[start:start + batch_size]))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def bulk_import_csv(filepath, class_num, batch_size=DEFAULT_BATCH_SIZE):
+    """Parse a class CSV file up front, then write it with bulk queries"""
+    started = time.perf_counter()
+    records = parse_csv_file(filepath, class_num)
+    result = bulk_import_records(records, batch_size=batch_size)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _import_parsed_file(source_path, class_num, file_hash, records, manifest,
+                        full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write the parsed records of one file. Unless `full` is set, only rows whose fingerprint
+    changed (or whose kanji is missing from the database) are written. Each batch commits
+    on its own; the caller saves the manifest last, so an interrupted import is simply
+    redone on the next run. Returns the result and the file's row fingerprints.
+    """
+    previous_hashes = manifest.row_hashes if manifest else {}
+    records = _dedupe(records)
+    row_hashes = {record['character']: row_fingerprint(record) for record in records}
+
+    if full:
+        changed = records
+    else:
+        # A kanji deleted from the database must be re-imported even if its row is unchanged
+        present = set(
+            Kanji.objects.filter(character__in=list(row_hashes)).values_list('character', flat=True)
+        )
+        changed = [
+            record for record in records
+            if record['character'] not in present
+            or previous_hashes.get(record['character']) != row_hashes[record['character']]
+        ]
+
+    result = ImportResult()
+    for start in range(0, len(changed), batch_size):
+        with transaction.atomic():
+            result.merge(write_kanji_batch(changed[start:start + batch_size]))
+
+    result.unchanged = len(records) - len(changed)
+    result.missing = [character for character in previous_hashes if character not in row_hashes]
+    return result, row_hashes
+
+
+def _save_manifest(source_path, class_num, file_hash, row_hashes):
+    ImportManifest.objects.update_or_create(
+        source_path=source_path,
+        defaults={'class_level': class_num, 'file_hash': file_hash, 'row_hashes': row_hashes}
+    )
+
+
+def _prune_missing(imported, present):
+    """
+    Delete the kanji that disappeared from their file. Characters that are still in some
+    file of the run (e.g. moved to another class) are not missing: deleting them would
+    cascade away their review history just before the other file re-created them.
+    """
+    for _, class_num, result in imported:
+        result.missing = [character for character in result.missing if character not in present]
+        if result.missing:
+            with deferred_version_bumps():
+                _, deleted = Kanji.objects.filter(
+                    character__in=result.missing, class_level=class_num
+                ).delete()
+            result.removed = deleted.get(Kanji._meta.label, 0)
+
+
+def _manifest_current(manifest, file_hash):
+    """True when the file is unchanged and every kanji it produced is still in the database"""
+    if manifest is None or manifest.file_hash != file_hash:
+        return False
+    characters = list(manifest.row_hashes)
+    return Kanji.objects.filter(character__in=characters).count() == len(characters)
+
+
+def import_csv_files(files, workers=1, full=False, prune=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import several class CSV files, yielding (filepath, class_num, ImportResult) per file.
+    `files` is a list of (filepath, class_num) in import order; later files win on duplicates.
+    Files whose hash matches the manifest are skipped unless `full` is set. With `workers` > 1
+    the files are parsed and normalised in a process pool while this process writes the
+    already-parsed files, so parsing runs in parallel with each other and with the writes.
+    With `prune`, rows missing from every file of the run are deleted once all files are
+    written, and the written files' results are yielded after that.
+    """
+    jobs = []
+    present = set()  # characters in any file of the run
+    for filepath, class_num in files:
+        source_path = os.path.abspath(filepath)
+        file_hash = file_fingerprint(source_path)
+        manifest = ImportManifest.objects.filter(source_path=source_path).first()
+        if not full and _manifest_current(manifest, file_hash):
+            present.update(manifest.row_hashes)
+            yield filepath, class_num, ImportResult(unchanged=len(manifest.row_hashes), file_skipped=True)
+            continue
+        jobs.append((filepath, source_path, class_num, file_hash, manifest))
+
+    if not jobs:
+        return
+
+    paths = [job[1] for job in jobs]
+    class_nums = [job[2] for job in jobs]
+    executor = None
+    if workers is None or workers > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs)))
+        parsed = executor.map(parse_csv_file, paths, class_nums)
+    else:
+        parsed = map(parse_csv_file, paths, class_nums)
+
+    imported = []
+    manifests = []
+    try:
+        started = time.perf_counter()
+        for (filepath, source_path, class_num, file_hash, manifest), records in zip(jobs, parsed):
+            result, row_hashes = _import_parsed_file(
+                source_path, class_num, file_hash, records, manifest,
+                full=full, batch_size=batch_size
+            )
+            result.elapsed = time.perf_counter() - started
+            present.update(row_hashes)
+            if prune:
+                # Nothing is missing for sure until every file has been written
+                imported.append((filepath, class_num, result))
+                manifests.append((source_path, class_num, file_hash, row_hashes))
+            else:
+                _save_manifest(source_path, class_num, file_hash, row_hashes)
+                yield filepath, class_num, result
+            started = time.perf_counter()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if prune:
+        with transaction.atomic():
+            _prune_missing(imported, present)
+            for manifest in manifests:
+                _save_manifest(*manifest)
+        yield from imported
+
+
+def incremental_import_csv(filepath, class_num, prune=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Re-import a class CSV file, touching only what changed since the last import.
+    The file is skipped entirely when its hash matches the manifest. Rows that disappeared
+    from the file are reported in `missing`, and deleted when `prune` is set.
+    """
+    for _, _, result in import_csv_files([(filepath, class_num)], prune=prune, batch_size=batch_size):
+        return result
+
+
+def stream_import(records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import an iterable of kanji records, committing every `batch_size` records.
+    Only one batch is held in memory at a time. `progress` is called with the running
+    ImportResult after each commit.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            result.merge(write_kanji_batch(batch))
+        batch.clear()
+        result.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(result)
+
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,116 @@
+"""
+Kana and romaji normalisation for reading lookups.
+Stored readings and queries go through the same functions, so both sides compare as hiragana.
+"""
+import re
+
+
+KATAKANA_START, KATAKANA_END = 0x30A1, 0x30F6
+KATAKANA_TO_HIRAGANA = 0x60
+
+# Hepburn (plus common Kunrei/Nihon-shiki spellings) to hiragana
+ROMAJI = {
+    'a': 'あ', 'i': 'い', 'u': 'う', 'e': 'え', 'o': 'お',
+    'ka': 'か', 'ki': 'き', 'ku': 'く', 'ke': 'け', 'ko': 'こ',
+    'ga': 'が', 'gi': 'ぎ', 'gu': 'ぐ', 'ge': 'げ', 'go': 'ご',
+    'sa': 'さ', 'shi': 'し', 'si': 'し', 'su': 'す', 'se': 'せ', 'so': 'そ',
+    'za': 'ざ', 'ji': 'じ', 'zi': 'じ', 'zu': 'ず', 'ze': 'ぜ', 'zo': 'ぞ',
+    'ta': 'た', 'chi': 'ち', 'ti': 'ち', 'tsu': 'つ', 'tu': 'つ', 'te': 'て', 'to': 'と',
+    'da': 'だ', 'di': 'ぢ', 'du': 'づ', 'de': 'で', 'do': 'ど',
+    'na': 'な', 'ni': 'に', 'nu': 'ぬ', 'ne': 'ね', 'no': 'の',
+    'ha': 'は', 'hi': 'ひ', 'fu': 'ふ', 'hu': 'ふ', 'he': 'へ', 'ho': 'ほ',
+    'ba': 'ば', 'bi': 'び', 'bu': 'ぶ', 'be': 'べ', 'bo': 'ぼ',
+    'pa': 'ぱ', 'pi': 'ぴ', 'pu': 'ぷ', 'pe': 'ぺ', 'po': 'ぽ',
+    'ma': 'ま', 'mi': 'み', 'mu': 'む', 'me': 'め', 'mo': 'も',
+    'ya': 'や', 'yu': 'ゆ', 'yo': 'よ',
+    'ra': 'ら', 'ri': 'り', 'ru': 'る', 're': 'れ', 'ro': 'ろ',
+    'wa': 'わ', 'wi': 'ゐ', 'we': 'ゑ', 'wo': 'を',
+    'kya': 'きゃ', 'kyu': 'きゅ', 'kyo': 'きょ',
+    'gya': 'ぎゃ', 'gyu': 'ぎゅ', 'gyo': 'ぎょ',
+    'sha': 'しゃ', 'shu': 'しゅ', 'sho': 'しょ', 'sya': 'しゃ', 'syu': 'しゅ', 'syo': 'しょ',
+    'ja': 'じゃ', 'ju': 'じゅ', 'jo': 'じょ', 'zya': 'じゃ', 'zyu': 'じゅ', 'zyo': 'じょ',
+    'jya': 'じゃ', 'jyu': 'じゅ', 'jyo': 'じょ',
+    'cha': 'ちゃ', 'chu': 'ちゅ', 'cho': 'ちょ', 'tya': 'ちゃ', 'tyu': 'ちゅ', 'tyo': 'ちょ',
+    'nya': 'にゃ', 'nyu': 'にゅ', 'nyo': 'にょ',
+    'hya': 'ひゃ', 'hyu': 'ひゅ', 'hyo': 'ひょ',
+    'bya': 'びゃ', 'byu': 'びゅ', 'byo': 'びょ',
+    'pya': 'ぴゃ', 'pyu': 'ぴゅ', 'pyo': 'ぴょ',
+    'mya': 'みゃ', 'myu': 'みゅ', 'myo': 'みょ',
+    'rya': 'りゃ', 'ryu': 'りゅ', 'ryo': 'りょ',
+}
+MACRONS = {'ā': 'aa', 'ī': 'ii', 'ū': 'uu', 'ē': 'ei', 'ō': 'ou', 'â': 'aa', 'î': 'ii', 'û': 'uu', 'ê': 'ei', 'ô': 'ou'}
+VOWELS = 'aiueo'
+
+# Okurigana markers: わる（い）, わる(い), わる.い
+OKURIGANA_PATTERN = re.compile(r'[（(.]')
+# Anything that is not part of the reading itself: brackets, dashes, dots, separators, spaces
+NON_KANA_PATTERN = re.compile(r'[^ぁ-ゖー]')
+ROMAJI_PATTERN = re.compile(r"[a-zāīūēōâîûêô'\-]+")
+
+
+def katakana_to_hiragana(text):
+    return ''.join(
+        chr(ord(char) - KATAKANA_TO_HIRAGANA) if KATAKANA_START <= ord(char) <= KATAKANA_END else char
+        for char in text
+    )
+
+
+def romaji_to_hiragana(text):
+    """Convert a romaji word to hiragana; letters that spell no kana are kept as they are"""
+    text = ''.join(MACRONS.get(char, char) for char in text.lower())
+    result = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        following = text[i + 1] if i + 1 < len(text) else ''
+        if char == 'n' and (not following or following == "'" or following not in VOWELS + 'y'):
+            # ん: before a consonant, at the end, or written n'
+            result.append('ん')
+            i += 2 if following == "'" else 1
+            continue
+        if char == following and char not in VOWELS + 'n':
+            # Doubled consonant: small っ
+            result.append('っ')
+            i += 1
+            continue
+        if char == 't' and text.startswith('tch', i):
+            result.append('っ')
+            i += 1
+            continue
+        for length in (3, 2, 1):
+            kana = ROMAJI.get(text[i:i + length])
+            if kana:
+                result.append(kana)
+                i += length
+                break
+        else:
+            if char not in "'-":
+                result.append(char)
+            i += 1
+    return ''.join(result)
+
+
+def to_hiragana(text):
+    """Hiragana for a reading written in hiragana, katakana, romaji or a mix of them"""
+    text = katakana_to_hiragana((text or '').strip().lower())
+    return ROMAJI_PATTERN.sub(lambda match: romaji_to_hiragana(match.group()), text)
+
+
+def normalize_reading(text):
+    """Lookup key of a query or stored reading: hiragana only, okurigana markers dropped"""
+    return NON_KANA_PATTERN.sub('', to_hiragana(text))
+
+
+def reading_keys(reading):
+    """
+    Keys a stored reading is found under: the full reading and, for kunyomi with
+    okurigana such as わる（い）, also its stem (わる)
+    """
+    keys = []
+    full = normalize_reading(reading)
+    if full:
+        keys.append(full)
+    stem = normalize_reading(OKURIGANA_PATTERN.split(reading, 1)[0])
+    if stem and stem != full:
+        keys.append(stem)
+    return keys
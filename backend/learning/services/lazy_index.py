@@ -0,0 +1,102 @@
+import threading
+import time
+from django.conf import settings
+from ..cache import CATALOG, get_version_numbers
+
+
+class LazyIndex:
+    """
+    Base class for process-local, in-memory indexes over the catalog.
+    The index is built from the database on first use, kept current by incremental
+    updates from model signals, and dropped (to be rebuilt on next use) after bulk changes.
+    The index tracks the catalog data version its contents correspond to: each incremental
+    update advances it by the one bump its write made. Changes made by other processes leave
+    a gap, seen either by the next incremental update or by a version check at most every
+    KANJI_INDEX_SYNC_SECONDS, and drop the index as well.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def is_built(self):
+        return self._built
+
+    def build(self):
+        """Load the whole index from the database; called with the lock held"""
+        raise NotImplementedError
+
+    def ensure_built(self):
+        if self._built:
+            self._sync()
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    # Read before loading, so a change committed meanwhile triggers a rebuild
+                    self._version = get_version_numbers(CATALOG)[CATALOG]
+                    self._checked_at = time.monotonic()
+                    self.build()
+                    self._built = True
+
+    def _sync(self):
+        """Drop the index when the catalog version moved since it was built"""
+        interval = getattr(settings, 'KANJI_INDEX_SYNC_SECONDS', 1.0)
+        if time.monotonic() - self._checked_at < interval:
+            return
+        version = get_version_numbers(CATALOG)[CATALOG]
+        with self._lock:
+            if self._built and version != self._version:
+                self.invalidate()
+            else:
+                self._checked_at = time.monotonic()
+
+    def catalog_written(self, version, hook, *args):
+        """
+        Apply one committed row change through the incremental `hook`. `version` is the
+        catalog version the write moved to, or None when its bump was deferred to a bulk
+        change (which drops the index anyway).
+        """
+        with self._lock:
+            if not self._built:
+                return
+            if version is not None and version > self._version + 1:
+                # Another process wrote in between
+                self.invalidate()
+                return
+            getattr(self, hook)(*args)
+            if version is not None:
+                self._version = max(self._version, version)
+
+    def invalidate(self):
+        """Forget the index; the next lookup rebuilds it"""
+        with self._lock:
+            self.clear()
+            self._built = False
+
+    def clear(self):
+        """Drop the in-memory data"""
+        raise NotImplementedError
+
+    # Incremental update hooks, called on commit by learning.signals.
+    # Each index overrides the ones for the rows it covers.
+
+    def kanji_saved(self, kanji):
+        pass
+
+    def kanji_deleted(self, kanji_id):
+        pass
+
+    def reading_saved(self, reading):
+        pass
+
+    def reading_deleted(self, reading_id):
+        pass
+
+    def example_saved(self, example):
+        pass
+
+    def example_deleted(self, example_id):
+        pass
@@ -0,0 +1,188 @@
+"""
+Parsing and normalisation of kanji source files.
+Kept free of Django imports so it can run inside worker processes.
+"""
+import csv
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+
+
+READING_SEPARATOR = '・'
+EXAMPLE_SEPARATOR = '||'
+EXAMPLE_FIELD_SEPARATOR = '::'
+
+STREAM_FORMATS = ('csv', 'tsv', 'xml')
+
+
+def _clean(value):
+    return (value or '').strip()
+
+
+def split_readings(value):
+    """Split a `・` separated reading field into a de-duplicated list"""
+    readings = []
+    for reading in _clean(value).split(READING_SEPARATOR):
+        reading = reading.strip()
+        if reading and reading not in readings:
+            readings.append(reading)
+    return readings
+
+
+def split_examples(value):
+    """
+    Split an example field into example dicts.
+    Format: japanese::reading::meaning||japanese::reading::meaning (reading is optional)
+    """
+    examples = []
+    for example_str in _clean(value).split(EXAMPLE_SEPARATOR):
+        example_str = example_str.strip()
+        if not example_str:
+            continue
+        parts = example_str.split(EXAMPLE_FIELD_SEPARATOR)
+        if len(parts) >= 2:
+            japanese = parts[0].strip()
+            reading = parts[1].strip() if len(parts) > 1 else ''
+            meaning = parts[2].strip() if len(parts) > 2 else ''
+            if japanese and meaning:
+                examples.append({
+                    'japanese': japanese,
+                    'reading': reading,
+                    'meaning': meaning
+                })
+    return examples
+
+
+def parse_kanji_row(row, class_num):
+    """
+    Normalise one CSV row into a kanji record.
+    Returns None for rows without a character.
+    """
+    character = _clean(row.get('character'))
+    if not character:
+        return None
+
+    examples = split_examples(row.get('example'))
+
+    # Also support old format with separate columns (for backward compatibility)
+    example_japanese = _clean(row.get('example_japanese'))
+    example_meaning = _clean(row.get('example_meaning'))
+    if example_japanese and example_meaning:
+        examples.append({
+            'japanese': example_japanese,
+            'reading': _clean(row.get('example_reading')),
+            'meaning': example_meaning
+        })
+
+    return {
+        'character': character,
+        'meaning': _clean(row.get('meaning')),
+        'class_level': class_num,
+        'onyomi': split_readings(row.get('onyomi')),
+        'kunyomi': split_readings(row.get('kunyomi')),
+        'examples': examples,
+    }
+
+
+def parse_csv_file(filepath, class_num):
+    """Parse a whole class CSV file into a list of kanji records"""
+    records = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            record = parse_kanji_row(row, class_num)
+            if record is not None:
+                records.append(record)
+    return records
+
+
+def file_fingerprint(filepath):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_fingerprint(record):
+    """SHA-256 of a normalised kanji record, stable across whitespace/formatting changes"""
+    payload = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def detect_source_format(filepath):
+    """Guess a streaming source format from the file extension"""
+    extension = os.path.splitext(filepath)[1].lower().lstrip('.')
+    if extension in ('tsv', 'tab'):
+        return 'tsv'
+    if extension == 'xml':
+        return 'xml'
+    return 'csv'
+
+
+def iter_delimited_records(filepath, delimiter=',', class_num=None):
+    """
+    Stream kanji records from a CSV/TSV file one row at a time.
+    Uses the class CSV columns; a `class_level` or `grade` column overrides `class_num` per row.
+    """
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            row_class = _clean(row.get('class_level') or row.get('grade'))
+            record = parse_kanji_row(row, int(row_class) if row_class.isdigit() else class_num)
+            if record is not None:
+                yield record
+
+
+def iter_kanjidic_records(filepath, class_num=None):
+    """
+    Stream kanji records from a KANJIDIC2-style XML dump.
+    Each <character> element is mapped and then cleared, so memory does not grow with the file.
+    School grades 1-6 become the class level; other kanji get `class_num`. The dictionary has
+    no example words, so records leave `examples` (and, without `class_num` or English
+    meanings, `class_level` and `meaning`) as None: the importer keeps what is stored.
+    """
+    context = ET.iterparse(filepath, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event != 'end' or elem.tag != 'character':
+            continue
+
+        character = _clean(elem.findtext('literal'))
+        if character:
+            grade = _clean(elem.findtext('misc/grade'))
+            level = int(grade) if grade.isdigit() and 1 <= int(grade) <= 6 else class_num
+            onyomi = []
+            kunyomi = []
+            meanings = []
+            for group in elem.iterfind('reading_meaning/rmgroup'):
+                for reading in group.iterfind('reading'):
+                    value = _clean(reading.text)
+                    if reading.get('r_type') == 'ja_on' and value and value not in onyomi:
+                        onyomi.append(value)
+                    elif reading.get('r_type') == 'ja_kun' and value and value not in kunyomi:
+                        kunyomi.append(value)
+                for meaning in group.iterfind('meaning'):
+                    # Untagged meanings are English
+                    if meaning.get('m_lang') in (None, 'en') and _clean(meaning.text):
+                        meanings.append(_clean(meaning.text))
+            yield {
+                'character': character,
+                'meaning': '/'.join(meanings) or None,
+                'class_level': level,
+                'onyomi': onyomi,
+                'kunyomi': kunyomi,
+                'examples': None,
+            }
+
+        elem.clear()
+        root.clear()
+
+
+def iter_source_records(filepath, source_format=None, class_num=None):
+    """Stream kanji records from a CSV, TSV or XML source"""
+    source_format = source_format or detect_source_format(filepath)
+    if source_format == 'xml':
+        return iter_kanjidic_records(filepath, class_num=class_num)
+    delimiter = '\t' if source_format == 'tsv' else ','
+    return iter_delimited_records(filepath, delimiter=delimiter, class_num=class_num)
@@ -0,0 +1,133 @@
+from bisect import bisect_left, bisect_right, insort
+from ..models import Kanji, KanjiReading
+from .kana import normalize_reading, reading_keys
+from .lazy_index import LazyIndex
+
+
+EXACT = 'exact'
+PREFIX = 'prefix'
+MATCH_MODES = (EXACT, PREFIX)
+
+# Sorts after every kana, closing the key range of a prefix query
+PREFIX_UPPER_BOUND = '￿'
+
+
+class ReadingIndex(LazyIndex):
+    """
+    Sorted array of (normalised reading, reading_id) over KanjiReading.
+    Readings are stored as hiragana with okurigana markers dropped, so ニチ, にち and nichi
+    all find the same rows; exact and prefix queries are a pair of binary searches.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._entries = []
+        self._readings = {}  # reading_id -> (kanji_id, reading, reading_type, keys)
+        self._kanji = {}  # kanji_id -> (character, meaning, class_level)
+
+    def build(self):
+        self.clear()
+        self._kanji = {
+            kanji_id: (character, meaning, class_level)
+            for kanji_id, character, meaning, class_level in Kanji.objects.order_by().values_list(
+                'id', 'character', 'meaning', 'class_level'
+            )
+        }
+        entries = []
+        for reading_id, kanji_id, reading, reading_type in KanjiReading.objects.order_by().values_list(
+            'id', 'kanji_id', 'reading', 'reading_type'
+        ):
+            keys = reading_keys(reading)
+            self._readings[reading_id] = (kanji_id, reading, reading_type, keys)
+            entries.extend((key, reading_id) for key in keys)
+        entries.sort()
+        self._entries = entries
+
+    def _drop_reading(self, reading_id):
+        previous = self._readings.pop(reading_id, None)
+        if previous is not None:
+            for key in previous[3]:
+                position = bisect_left(self._entries, (key, reading_id))
+                if position < len(self._entries) and self._entries[position] == (key, reading_id):
+                    del self._entries[position]
+
+    # Incremental updates, applied only once the index has been built
+
+    def kanji_saved(self, kanji):
+        with self._lock:
+            if self._built:
+                self._kanji[kanji.id] = (kanji.character, kanji.meaning, kanji.class_level)
+
+    def kanji_deleted(self, kanji_id):
+        with self._lock:
+            if self._built:
+                self._kanji.pop(kanji_id, None)
+
+    def reading_saved(self, reading):
+        with self._lock:
+            if self._built:
+                self._drop_reading(reading.id)
+                keys = reading_keys(reading.reading)
+                self._readings[reading.id] = (reading.kanji_id, reading.reading, reading.reading_type, keys)
+                for key in keys:
+                    insort(self._entries, (key, reading.id))
+
+    def reading_deleted(self, reading_id):
+        with self._lock:
+            if self._built:
+                self._drop_reading(reading_id)
+
+    # Queries
+
+    def _reading_ids(self, key, match):
+        if match == PREFIX:
+            start = bisect_left(self._entries, (key,))
+            end = bisect_left(self._entries, (key + PREFIX_UPPER_BOUND,))
+        else:
+            start = bisect_left(self._entries, (key,))
+            end = bisect_right(self._entries, (key, float('inf')))
+        # A reading can sit under both its full form and its stem; keep each once, in key order
+        return list(dict.fromkeys(reading_id for _, reading_id in self._entries[start:end]))
+
+    def lookup(self, queries, match=EXACT, limit=50):
+        """
+        Look up each query (hiragana, katakana or romaji) and return one result per query:
+        the matching kanji, at most `limit` of them, with the readings that matched.
+        """
+        self.ensure_built()
+        results = []
+        with self._lock:
+            for query in queries:
+                key = normalize_reading(query)
+                matches = {}
+                if key:
+                    for reading_id in self._reading_ids(key, match):
+                        kanji_id, reading, reading_type, _ = self._readings[reading_id]
+                        if kanji_id in self._kanji:
+                            matches.setdefault(kanji_id, []).append({
+                                'reading': reading,
+                                'reading_type': reading_type,
+                            })
+                kanji = []
+                for kanji_id, readings in list(matches.items())[:limit]:
+                    character, meaning, class_level = self._kanji[kanji_id]
+                    kanji.append({
+                        'id': kanji_id,
+                        'character': character,
+                        'meaning': meaning,
+                        'class_level': class_level,
+                        'readings': readings,
+                    })
+                results.append({
+                    'query': query,
+                    'normalized': key,
+                    'count': len(matches),
+                    'kanji': kanji,
+                })
+        return results
+
+
+reading_index = ReadingIndex()
@@ -0,0 +1,61 @@
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from ..models import Kanji, KanjiReview
+
+
+# Queue priority of a card
+DUE = 0
+NEW = 1
+FALLBACK = 2
+
+REVIEW_FIELDS = ('id', 'kanji_id', 'mastery_level', 'next_review', 'last_reviewed', 'review_count', 'correct_count')
+
+
+def filtered_reviews(class_level=None, mastery_level=None):
+    reviews = KanjiReview.objects.all()
+    if class_level is not None:
+        # Checked per card rather than joined, so the scan follows the review indexes' order
+        # instead of starting from the class's kanji and sorting their reviews
+        reviews = reviews.filter(Exists(Kanji.objects.filter(pk=OuterRef('kanji_id'), class_level=class_level)))
+    if mastery_level is not None:
+        reviews = reviews.filter(mastery_level=mastery_level)
+    return reviews
+
+
+def review_tiers(class_level=None, mastery_level=None, exclude_kanji=(), now=None):
+    """
+    The queue's two queries, each read along an index so that a LIMIT stops the scan early:
+    due cards by (next_review, id), and every card by (review_count, id), never-reviewed
+    cards first. The second is only read once the due cards ran out, so the caller
+    excludes the cards it already selected from it.
+    """
+    now = now or timezone.now()
+    reviews = filtered_reviews(class_level, mastery_level)
+    if exclude_kanji:
+        reviews = reviews.exclude(kanji_id__in=exclude_kanji)
+    return (
+        reviews.filter(next_review__lte=now).order_by('next_review', 'id'),
+        reviews.order_by('review_count', 'id'),
+    )
+
+
+def select_review_cards(limit=1, class_level=None, mastery_level=None, exclude_kanji=(), now=None):
+    """
+    Return up to `limit` review rows (dicts) in queue order: due cards by next_review,
+    then never-reviewed cards, then the other cards by review count. Each row carries its
+    `priority` (DUE, NEW or FALLBACK).
+
+    This is a cascade of two indexed queries rather than one: a single ORDER BY over
+    "due first, then the rest" cannot follow any index, and would sort every matching
+    card. The second query only runs when there are fewer than `limit` due cards.
+    """
+    due, rest = review_tiers(class_level, mastery_level, exclude_kanji, now)
+    selected = [{**row, 'priority': DUE} for row in due.values(*REVIEW_FIELDS)[:limit]]
+    if len(selected) < limit:
+        # Every due card is selected by now, so the remaining ones are all not due
+        rest = rest.exclude(kanji_id__in=[row['kanji_id'] for row in selected])
+        selected.extend(
+            {**row, 'priority': NEW if row['review_count'] == 0 else FALLBACK}
+            for row in rest.values(*REVIEW_FIELDS)[:limit - len(selected)]
+        )
+    return selected
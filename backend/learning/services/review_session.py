@@ -0,0 +1,50 @@
+from django.core import signing
+from .review_selector import select_review_cards
+
+
+SESSION_SALT = 'learning.review-session'
+# Sessions expire after a day; the served list is capped to keep tokens small
+SESSION_MAX_AGE = 60 * 60 * 24
+MAX_SESSION_CARDS = 1000
+
+
+class InvalidSession(Exception):
+    """The session token was tampered with, has expired or is malformed"""
+
+
+def encode_session(served, class_level=None, mastery_level=None):
+    """Signed, compressed token holding the session's filters and the kanji already served"""
+    return signing.dumps(
+        {'served': sorted(served), 'class': class_level, 'mastery': mastery_level},
+        salt=SESSION_SALT,
+        compress=True,
+    )
+
+
+def decode_session(token):
+    try:
+        session = signing.loads(token, salt=SESSION_SALT, max_age=SESSION_MAX_AGE)
+    except signing.BadSignature as e:
+        raise InvalidSession(str(e)) from None
+    if not isinstance(session, dict) or not isinstance(session.get('served'), list):
+        raise InvalidSession('Malformed session')
+    return session
+
+
+def next_session_cards(limit, token=None, class_level=None, mastery_level=None):
+    """
+    Select the next `limit` review rows of a session, skipping kanji already served in it.
+    A new session (no token) uses the given filters; a continued one keeps its own.
+    Returns (new token, review rows). No server-side state is kept: the token is the session.
+    """
+    served = []
+    if token:
+        session = decode_session(token)
+        served = session['served']
+        class_level, mastery_level = session['class'], session['mastery']
+    limit = max(0, min(limit, MAX_SESSION_CARDS - len(served)))
+    reviews = select_review_cards(
+        limit=limit, class_level=class_level, mastery_level=mastery_level, exclude_kanji=served
+    ) if limit else []
+    served = served + [review['kanji_id'] for review in reviews]
+    return encode_session(served, class_level, mastery_level), reviews
@@ -0,0 +1,235 @@
+import random
+import time
+from dataclasses import dataclass
+from datetime import timezone as dt_timezone
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ..cache import REVIEWS, bump_version, deferred_version_bumps, get_version_numbers
+from ..models import Kanji, KanjiReview, ReviewLog
+from .activity import record_answers
+from .due_queue import due_queue
+from .scheduler import STATE_FIELDS, get_scheduler
+from .stats import StatsDelta, apply_delta
+
+
+RESULTS = ('correct', 'incorrect', 'hard')
+REVIEW_UPDATE_FIELDS = ['mastery_level', 'next_review', 'last_reviewed', 'review_count', 'correct_count'] + STATE_FIELDS
+MAX_BATCH_SIZE = 1000
+# Counters are written as increments rather than values
+COUNTER_FIELDS = ('review_count', 'correct_count')
+# Compare-and-swap attempts of a single submit before giving up
+MAX_SUBMIT_ATTEMPTS = 25
+
+# Per-item status of a batch submission
+APPLIED = 'applied'
+STALE = 'stale'  # an answer at or after reviewed_at has already been recorded
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def apply_result(review, result, reviewed_at, scheduler=None):
+    """
+    Update a KanjiReview in memory for one answer ('correct', 'hard', anything else is incorrect).
+    The next review date comes from `scheduler`, by default the deployment's configured one.
+    """
+    review.review_count += 1
+
+    if result == 'correct':
+        review.correct_count += 1
+        review.mastery_level += 1
+    elif result == 'hard':
+        # Keep same level
+        pass
+    else:  # incorrect
+        # Reset or decrease mastery level
+        review.mastery_level = max(0, review.mastery_level - 1)
+
+    # Spaced repetition: the scheduler may look at the previous last_reviewed
+    (scheduler or get_scheduler()).schedule(review, result, reviewed_at)
+    review.last_reviewed = reviewed_at
+
+
+def parse_response_time(value):
+    """Milliseconds as a non-negative int, or None when missing or unusable"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def review_log_entry(review, result, reviewed_at, interval_before, response_time_ms=None):
+    """Unsaved ReviewLog row for an answer just applied to `review`"""
+    return ReviewLog(
+        kanji_id=review.kanji_id,
+        reviewed_at=reviewed_at,
+        result=result if result in RESULTS else 'incorrect',
+        interval_before=interval_before,
+        interval_after=review.interval_days,
+        response_time_ms=response_time_ms,
+    )
+
+
+class ReviewConflict(Exception):
+    """A submit kept losing the race against concurrent submits for the same card"""
+
+
+def submit_review(kanji_id, result, reviewed_at=None, response_time_ms=None, scheduler=None):
+    """
+    Apply one answer without lost updates and log it. Returns the updated KanjiReview,
+    or None if the kanji does not exist.
+
+    The new state is computed from a read of the row and written with a conditional UPDATE
+    of the changed fields only: counters as F() increments, the rest guarded by the
+    review_count that was read. If a concurrent submit got there first, no row matches and
+    the answer is recomputed from fresh state. Raises ReviewConflict after MAX_SUBMIT_ATTEMPTS.
+    """
+    scheduler = scheduler or get_scheduler()
+    # The class level is read along, for the stats snapshot's per-class counts
+    reviews = KanjiReview.objects.filter(kanji_id=kanji_id).annotate(class_level=F('kanji__class_level'))
+    for attempt in range(MAX_SUBMIT_ATTEMPTS):
+        review = reviews.first()
+        if review is None:
+            if not Kanji.objects.filter(id=kanji_id).exists():
+                return None
+            KanjiReview.objects.get_or_create(kanji_id=kanji_id)
+            review = reviews.first()
+
+        before = {field: getattr(review, field) for field in REVIEW_UPDATE_FIELDS}
+        answered_at = reviewed_at or timezone.now()
+        apply_result(review, result, answered_at, scheduler)
+        changes = {
+            field: F(field) + (getattr(review, field) - before[field]) if field in COUNTER_FIELDS else getattr(review, field)
+            for field in REVIEW_UPDATE_FIELDS if getattr(review, field) != before[field]
+        }
+
+        with transaction.atomic():
+            updated = KanjiReview.objects.filter(pk=review.pk, review_count=before['review_count']).update(**changes)
+            if updated:
+                review_log_entry(review, result, answered_at, before['interval_days'], response_time_ms).save()
+                record_answers([(answered_at, result, before['review_count'] == 0)])
+                delta = StatsDelta()
+                delta.review_changed(
+                    review.class_level,
+                    (before['mastery_level'], before['review_count']),
+                    (review.mastery_level, review.review_count),
+                )
+                apply_delta(delta)
+                # update() sends no post_save
+                bump_version(REVIEWS)
+                if due_queue.enabled():
+                    version = get_version_numbers(REVIEWS)[REVIEWS]
+                    transaction.on_commit(lambda: due_queue.review_updated(review, version))
+                return review
+        # Lost the race: back off a little so the winners can finish, then retry
+        time.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+    raise ReviewConflict(f'Review of kanji {kanji_id} kept conflicting with concurrent submits')
+
+
+@dataclass
+class BatchItem:
+    index: int
+    kanji_id: object
+    result: object
+    reviewed_at: object
+    response_time_ms: int = None
+    status: str = APPLIED
+    error: str = ''
+    mastery_level: int = None
+    next_review: object = None
+
+    def as_dict(self):
+        data = {'index': self.index, 'kanji_id': self.kanji_id, 'status': self.status}
+        if self.error:
+            data['error'] = self.error
+        if self.status == APPLIED:
+            data['mastery_level'] = self.mastery_level
+            data['next_review'] = self.next_review.isoformat()
+        return data
+
+
+def _parse_item(index, raw, now):
+    if not isinstance(raw, dict):
+        return BatchItem(index, None, None, None, status=INVALID, error='Each review must be an object.')
+    item = BatchItem(
+        index, raw.get('kanji_id'), raw.get('result'), now, parse_response_time(raw.get('response_time_ms'))
+    )
+    if isinstance(item.kanji_id, bool) or not isinstance(item.kanji_id, int):
+        item.status, item.error = INVALID, 'kanji_id must be an integer.'
+    elif item.result not in RESULTS:
+        item.status, item.error = INVALID, f'result must be one of: {", ".join(RESULTS)}.'
+    elif raw.get('reviewed_at') is not None:
+        reviewed_at = parse_datetime(str(raw['reviewed_at']))
+        if reviewed_at is None:
+            item.status, item.error = INVALID, 'reviewed_at must be an ISO 8601 date and time.'
+        else:
+            if timezone.is_naive(reviewed_at):
+                reviewed_at = timezone.make_aware(reviewed_at, dt_timezone.utc)
+            # Clocks of offline clients may run ahead; never schedule from the future
+            item.reviewed_at = min(reviewed_at, now)
+    return item
+
+
+def submit_review_batch(raw_items):
+    """
+    Apply a list of {kanji_id, result, reviewed_at, response_time_ms} answers in one transaction.
+    Answers are applied in reviewed_at order, so several answers for one kanji (e.g. an
+    offline session) replay like live submits; answers older than the card's last review
+    are reported as stale, which makes re-uploading a batch harmless.
+    Returns one status dict per item, in input order.
+    """
+    now = timezone.now()
+    items = [_parse_item(index, raw, now) for index, raw in enumerate(raw_items)]
+    valid = [item for item in items if item.status == APPLIED]
+    kanji_ids = {item.kanji_id for item in valid}
+
+    with transaction.atomic(), deferred_version_bumps(REVIEWS):
+        # Row locks where the database has them; SQLite serialises the whole transaction
+        reviews = {
+            review.kanji_id: review
+            for review in KanjiReview.objects.select_for_update(of=('self',)).filter(
+                kanji_id__in=kanji_ids
+            ).annotate(class_level=F('kanji__class_level'))
+        }
+        delta = StatsDelta()
+        missing = kanji_ids - reviews.keys()
+        if missing:
+            existing = dict(Kanji.objects.filter(id__in=missing).values_list('id', 'class_level'))
+            created = KanjiReview.objects.bulk_create([KanjiReview(kanji_id=kanji_id) for kanji_id in existing])
+            for review in created:
+                review.class_level = existing[review.kanji_id]
+                delta.review(review.class_level, review.mastery_level, review.review_count)
+            reviews.update((review.kanji_id, review) for review in created)
+        before = {review.pk: (review.mastery_level, review.review_count) for review in reviews.values()}
+
+        scheduler = get_scheduler()
+        changed = {}
+        logs = []
+        answers = []
+        for item in sorted(valid, key=lambda item: (item.reviewed_at, item.index)):
+            review = reviews.get(item.kanji_id)
+            if review is None:
+                item.status, item.error = NOT_FOUND, 'Kanji not found'
+            elif review.last_reviewed is not None and item.reviewed_at <= review.last_reviewed:
+                item.status = STALE
+            else:
+                interval_before = review.interval_days
+                answers.append((item.reviewed_at, item.result, review.review_count == 0))
+                apply_result(review, item.result, item.reviewed_at, scheduler)
+                logs.append(review_log_entry(
+                    review, item.result, item.reviewed_at, interval_before, item.response_time_ms
+                ))
+                item.mastery_level, item.next_review = review.mastery_level, review.next_review
+                changed[review.pk] = review
+        KanjiReview.objects.bulk_update(list(changed.values()), REVIEW_UPDATE_FIELDS)
+        ReviewLog.objects.bulk_create(logs)
+        record_answers(answers)
+        for review in changed.values():
+            delta.review_changed(review.class_level, before[review.pk], (review.mastery_level, review.review_count))
+        apply_delta(delta)
+
+    return [item.as_dict() for item in items]
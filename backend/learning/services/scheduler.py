@@ -0,0 +1,230 @@
+"""
+Spaced-repetition schedulers.
+
+A scheduler decides when a card is due next and keeps its own state on KanjiReview
+(interval_days, ease_factor, stability, recall_difficulty). The shared counters and
+mastery_level are updated by services.reviews.apply_result() whatever scheduler is used.
+
+Each scheduler works on one card (`schedule`, on every answer) and on whole columns of
+cards (`initial_state` and `next_intervals`, used by the reschedule_reviews command to
+migrate or reschedule the table in one pass). Only `initial_state` derives anything from
+the counters; `next_intervals` keeps the interval the last answer stored, so rescheduling
+without migrating agrees with the per-answer rule. The deployment picks one with
+settings.KANJI_SCHEDULER; settings.KANJI_SCHEDULER_OPTIONS is passed to its constructor.
+"""
+import math
+from datetime import timedelta
+from django.conf import settings
+
+
+# Grades used by SM-2 (0-5) and FSRS (1-4) for our three answers
+SM2_QUALITY = {'correct': 4, 'hard': 3, 'incorrect': 1}
+FSRS_GRADE = {'correct': 3, 'hard': 2, 'incorrect': 1}
+
+# Columns the batch mode reads and writes
+STATE_FIELDS = ['interval_days', 'ease_factor', 'stability', 'recall_difficulty']
+
+
+def _grade(table, result):
+    return table.get(result, table['incorrect'])
+
+
+class Scheduler:
+    name = None
+
+    def __init__(self, max_interval=None):
+        if max_interval is not None:
+            self.max_interval = max_interval
+
+    def schedule(self, review, result, reviewed_at):
+        """
+        Update the scheduler state and next_review of one KanjiReview for an answer.
+        Called after mastery_level has been updated and before last_reviewed is.
+        """
+        interval = min(self.max_interval, self.next_interval(review, result))
+        review.interval_days = interval
+        # Failed cards come back the next day, whatever their new interval
+        review.next_review = reviewed_at + timedelta(days=max(interval, 1))
+
+    def next_interval(self, review, result):
+        raise NotImplementedError
+
+    def initial_state(self, columns):
+        """
+        State columns for cards that were scheduled by another scheduler, derived from the
+        counters every scheduler keeps. `columns` maps field names to equal-length lists.
+        """
+        return {field: columns[field] for field in STATE_FIELDS}
+
+    def next_intervals(self, columns):
+        """Current interval (days) of every card in `columns`: the stored one, within max_interval"""
+        return [min(self.max_interval, interval) for interval in columns['interval_days']]
+
+
+class LegacyScheduler(Scheduler):
+    """The original rule: 2 days per mastery level up to 30 days, 1 day after a miss"""
+    name = 'legacy'
+    max_interval = 30
+
+    def next_interval(self, review, result):
+        if result == 'correct':
+            return review.mastery_level * 2
+        return 1
+
+    def initial_state(self, columns):
+        # 2 days per mastery level; cards without mastery come back the next day
+        return {
+            **super().initial_state(columns),
+            'interval_days': [
+                min(self.max_interval, mastery_level * 2) if mastery_level else 1
+                for mastery_level in columns['mastery_level']
+            ],
+        }
+
+
+class SM2Scheduler(Scheduler):
+    """
+    SuperMemo SM-2: intervals of 1 and 6 days, then the previous interval times the card's
+    ease factor, which moves with answer quality. A miss restarts the sequence.
+    """
+    name = 'sm2'
+    max_interval = 365
+    min_ease = 1.3
+
+    def next_interval(self, review, result):
+        quality = _grade(SM2_QUALITY, result)
+        review.ease_factor = max(
+            self.min_ease,
+            review.ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        )
+        if quality < 3:
+            # Relearning: due tomorrow, then 1 and 6 days again
+            return 0
+        if review.interval_days < 1:
+            return 1
+        if review.interval_days < 6:
+            return 6
+        return round(review.interval_days * review.ease_factor)
+
+    def initial_state(self, columns):
+        # Ease from accuracy (2.5 for a perfect record, down to the minimum), interval from mastery
+        ease = [
+            max(self.min_ease, 2.5 - 1.5 * (1 - correct / reviews)) if reviews else 2.5
+            for correct, reviews in zip(columns['correct_count'], columns['review_count'])
+        ]
+        intervals = [0.0] * len(ease)
+        for i, (mastery_level, factor) in enumerate(zip(columns['mastery_level'], ease)):
+            interval = 0.0
+            for step in range(mastery_level):
+                interval = 1 if step == 0 else 6 if step == 1 else round(interval * factor)
+            intervals[i] = min(self.max_interval, interval)
+        return {
+            'interval_days': intervals,
+            'ease_factor': ease,
+            'stability': columns['stability'],
+            'recall_difficulty': columns['recall_difficulty'],
+        }
+
+
+class FSRSScheduler(Scheduler):
+    """
+    FSRS (Free Spaced Repetition Scheduler, v4.5 formulas and default weights): each card has a
+    memory stability (days until recall probability drops to 90%) and a difficulty (1-10).
+    The interval is chosen so the predicted recall at review time equals `retention`.
+    """
+    name = 'fsrs'
+    max_interval = 365
+    decay = -0.5
+    factor = 19 / 81
+    weights = (
+        0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+        0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+    )
+
+    def __init__(self, max_interval=None, retention=0.9, weights=None):
+        super().__init__(max_interval)
+        self.retention = retention
+        if weights is not None:
+            self.weights = tuple(weights)
+
+    def _initial_difficulty(self, grade):
+        w = self.weights
+        return min(10.0, max(1.0, w[4] - math.exp(w[5] * (grade - 1)) + 1))
+
+    def _retrievability(self, elapsed, stability):
+        return (1 + self.factor * elapsed / stability) ** self.decay
+
+    def _interval(self, stability):
+        return stability / self.factor * (self.retention ** (1 / self.decay) - 1)
+
+    def schedule(self, review, result, reviewed_at):
+        grade = _grade(FSRS_GRADE, result)
+        w = self.weights
+        if review.stability <= 0:
+            review.stability = w[grade - 1]
+            review.recall_difficulty = self._initial_difficulty(grade)
+        else:
+            # last_reviewed still holds the previous answer (see apply_result)
+            elapsed = 0.0
+            if review.last_reviewed is not None:
+                elapsed = max(0.0, (reviewed_at - review.last_reviewed).total_seconds() / 86400)
+            stability, difficulty = review.stability, review.recall_difficulty
+            recall = self._retrievability(elapsed, stability)
+            if grade == 1:
+                review.stability = min(stability, (
+                    w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - recall))
+                ))
+            else:
+                hard_penalty = w[15] if grade == 2 else 1.0
+                review.stability = stability * (
+                    math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                    * (math.exp(w[10] * (1 - recall)) - 1) * hard_penalty + 1
+                )
+            difficulty = difficulty - w[6] * (grade - 3)
+            # Mean reversion towards the difficulty of an easy first answer
+            difficulty = w[7] * self._initial_difficulty(4) + (1 - w[7]) * difficulty
+            review.recall_difficulty = min(10.0, max(1.0, difficulty))
+        interval = 0 if grade == 1 else min(self.max_interval, max(1, round(self._interval(review.stability))))
+        review.interval_days = interval
+        review.next_review = reviewed_at + timedelta(days=max(interval, 1))
+
+    def initial_state(self, columns):
+        # Cards with FSRS memory state keep it; for the others stability comes from the current
+        # interval (or a first-answer estimate) and difficulty from accuracy. Intervals follow
+        # from stability at the configured retention.
+        legacy = LegacyScheduler().initial_state(columns)['interval_days']
+        stability = [
+            current if current > 0 else (interval if interval >= 1 else legacy_interval) if reviews else 0.0
+            for current, interval, legacy_interval, reviews in zip(
+                columns['stability'], columns['interval_days'], legacy, columns['review_count']
+            )
+        ]
+        difficulty = [
+            current if current > 0 else min(10.0, max(1.0, 1 + 9 * (1 - correct / reviews))) if reviews else 0.0
+            for current, correct, reviews in zip(
+                columns['recall_difficulty'], columns['correct_count'], columns['review_count']
+            )
+        ]
+        return {
+            'interval_days': [
+                min(self.max_interval, max(1, round(self._interval(value)))) if value > 0 else 0
+                for value in stability
+            ],
+            'ease_factor': columns['ease_factor'],
+            'stability': stability,
+            'recall_difficulty': difficulty,
+        }
+
+
+SCHEDULERS = {scheduler.name: scheduler for scheduler in (LegacyScheduler, SM2Scheduler, FSRSScheduler)}
+
+
+def get_scheduler(name=None, **options):
+    """The scheduler called `name`, or the deployment's configured one"""
+    if name is None:
+        name = getattr(settings, 'KANJI_SCHEDULER', LegacyScheduler.name)
+        options = {**getattr(settings, 'KANJI_SCHEDULER_OPTIONS', {}), **options}
+    try:
+        return SCHEDULERS[name](**options)
+    except KeyError:
+        raise ValueError(f'Unknown scheduler "{name}". Choose from: {", ".join(SCHEDULERS)}') from None
@@ -0,0 +1,196 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from ..models import Kanji, KanjiExample
+from .lazy_index import LazyIndex
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# A match in the kanji's own meaning counts more than one in an example word's meaning
+KANJI_MEANING_WEIGHT = 3.0
+EXAMPLE_MEANING_WEIGHT = 1.0
+# Prefix matches rank below exact token matches
+PREFIX_MATCH_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 200
+
+
+def tokenize(text):
+    """Lower-cased English word tokens"""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+class MeaningSearchIndex(LazyIndex):
+    """
+    Inverted index over Kanji.meaning and KanjiExample.meaning.
+    Postings map a token to {kanji_id: weight}; a sorted vocabulary answers prefix queries
+    with a binary search. Kanji and examples keep their own token weights so a saved or
+    deleted row can be swapped out of the postings without touching anything else.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._postings = defaultdict(dict)
+        self._vocabulary = []
+        self._kanji = {}  # kanji_id -> (character, meaning, class_level)
+        self._kanji_terms = {}  # kanji_id -> {token: weight}
+        self._example_terms = {}  # example_id -> (kanji_id, {token: weight})
+        self._kanji_examples = defaultdict(set)  # kanji_id -> example ids
+
+    def build(self):
+        self.clear()
+        for kanji_id, character, meaning, class_level in Kanji.objects.order_by().values_list(
+            'id', 'character', 'meaning', 'class_level'
+        ):
+            self._set_kanji(kanji_id, character, meaning, class_level)
+        for example_id, kanji_id, meaning in KanjiExample.objects.order_by().values_list(
+            'id', 'kanji_id', 'meaning'
+        ):
+            self._set_example(example_id, kanji_id, meaning)
+
+    @staticmethod
+    def _weights(text, weight):
+        terms = defaultdict(float)
+        for token in tokenize(text):
+            terms[token] += weight
+        return terms
+
+    def _add_terms(self, kanji_id, terms):
+        for token, weight in terms.items():
+            postings = self._postings[token]
+            if not postings:
+                insort(self._vocabulary, token)
+            postings[kanji_id] = postings.get(kanji_id, 0.0) + weight
+
+    def _remove_terms(self, kanji_id, terms):
+        for token, weight in terms.items():
+            postings = self._postings.get(token)
+            if not postings or kanji_id not in postings:
+                continue
+            remaining = postings[kanji_id] - weight
+            if remaining > 1e-9:
+                postings[kanji_id] = remaining
+            else:
+                del postings[kanji_id]
+            if not postings:
+                del self._postings[token]
+                self._vocabulary.pop(bisect_left(self._vocabulary, token))
+
+    def _set_kanji(self, kanji_id, character, meaning, class_level):
+        self._remove_terms(kanji_id, self._kanji_terms.pop(kanji_id, {}))
+        terms = self._weights(meaning, KANJI_MEANING_WEIGHT)
+        self._kanji[kanji_id] = (character, meaning, class_level)
+        self._kanji_terms[kanji_id] = terms
+        self._add_terms(kanji_id, terms)
+
+    def _set_example(self, example_id, kanji_id, meaning):
+        self._drop_example(example_id)
+        terms = self._weights(meaning, EXAMPLE_MEANING_WEIGHT)
+        self._example_terms[example_id] = (kanji_id, terms)
+        self._kanji_examples[kanji_id].add(example_id)
+        self._add_terms(kanji_id, terms)
+
+    def _drop_example(self, example_id):
+        previous = self._example_terms.pop(example_id, None)
+        if previous is not None:
+            kanji_id, terms = previous
+            self._remove_terms(kanji_id, terms)
+            self._kanji_examples[kanji_id].discard(example_id)
+
+    # Incremental updates, applied only once the index has been built
+
+    def kanji_saved(self, kanji):
+        with self._lock:
+            if self._built:
+                self._set_kanji(kanji.id, kanji.character, kanji.meaning, kanji.class_level)
+
+    def kanji_deleted(self, kanji_id):
+        with self._lock:
+            if self._built:
+                self._remove_terms(kanji_id, self._kanji_terms.pop(kanji_id, {}))
+                self._kanji.pop(kanji_id, None)
+                for example_id in list(self._kanji_examples.pop(kanji_id, ())):
+                    self._drop_example(example_id)
+
+    def example_saved(self, example):
+        with self._lock:
+            if self._built:
+                self._set_example(example.id, example.kanji_id, example.meaning)
+
+    def example_deleted(self, example_id):
+        with self._lock:
+            if self._built:
+                self._drop_example(example_id)
+
+    # Queries
+
+    def _matches(self, token):
+        """{kanji_id: score} for one query token: exact matches plus prefix expansions"""
+        scores = defaultdict(float)
+        total = len(self._kanji) or 1
+
+        def add(term, factor):
+            postings = self._postings[term]
+            idf = math.log(1 + total / len(postings))
+            for kanji_id, weight in postings.items():
+                scores[kanji_id] += weight * idf * factor
+
+        if token in self._postings:
+            add(token, 1.0)
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self._vocabulary, token)
+            for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    add(term, PREFIX_MATCH_FACTOR)
+        return scores
+
+    def search(self, query, limit=20):
+        """
+        Rank kanji whose meanings (or example meanings) match every query token,
+        exactly or by prefix. Returns (total matches, top `limit` results).
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return 0, []
+        self.ensure_built()
+        with self._lock:
+            combined = None
+            for token in tokens:
+                scores = self._matches(token)
+                if combined is None:
+                    combined = scores
+                else:
+                    combined = {
+                        kanji_id: score + scores[kanji_id]
+                        for kanji_id, score in combined.items() if kanji_id in scores
+                    }
+                if not combined:
+                    return 0, []
+            # An example can briefly outlive its kanji between two signals
+            combined = {kanji_id: score for kanji_id, score in combined.items() if kanji_id in self._kanji}
+
+            top = heapq.nsmallest(
+                limit, combined.items(), key=lambda item: (-item[1], self._kanji[item[0]][0])
+            )
+            results = []
+            for kanji_id, score in top:
+                character, meaning, class_level = self._kanji[kanji_id]
+                results.append({
+                    'id': kanji_id,
+                    'character': character,
+                    'meaning': meaning,
+                    'class_level': class_level,
+                    'score': round(score, 3),
+                })
+            return len(combined), results
+
+
+meaning_index = MeaningSearchIndex()
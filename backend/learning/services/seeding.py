@@ -0,0 +1,86 @@
+import logging
+import threading
+from django.db import connection
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+SEED_PENDING = 'pending'
+SEED_RUNNING = 'running'
+SEED_READY = 'ready'
+SEED_FAILED = 'failed'
+
+# Process-wide seeding state: the empty-database check and CSV import run at most once per process
+_state = {
+    'status': SEED_PENDING,
+    'imported': False,
+    'error': None,
+    'started_at': None,
+    'finished_at': None,
+}
+_lock = threading.Lock()  # held for the whole import
+_thread_lock = threading.Lock()  # held only while starting the background thread
+_thread = None
+
+
+def get_seed_state():
+    """Return a snapshot of the seeding state, suitable for an API response"""
+    state = dict(_state)
+    for key in ('started_at', 'finished_at'):
+        if state[key] is not None:
+            state[key] = state[key].isoformat()
+    return state
+
+
+def is_seeded():
+    return _state['status'] == SEED_READY
+
+
+def ensure_seeded(silent=True, workers=1):
+    """
+    Import the kanji CSV files if the database is empty, once per process.
+    Later calls return immediately; concurrent callers wait for the running import.
+    Returns True when the data is ready.
+    """
+    if _state['status'] == SEED_READY:
+        return True
+
+    with _lock:
+        if _state['status'] == SEED_READY:
+            return True
+
+        from ..utils import auto_import_kanji_data
+
+        _state.update(status=SEED_RUNNING, error=None, started_at=timezone.now(), finished_at=None)
+        try:
+            _state['imported'] = auto_import_kanji_data(silent=silent, workers=workers)
+        except Exception as e:
+            # Leave the state retryable; the API reports the failure instead of blocking on it
+            logger.exception('Kanji seeding failed')
+            _state.update(status=SEED_FAILED, error=str(e), finished_at=timezone.now())
+            return False
+
+        _state.update(status=SEED_READY, finished_at=timezone.now())
+        return True
+
+
+def _seed_in_background():
+    try:
+        ensure_seeded(silent=True)
+    finally:
+        connection.close()
+
+
+def start_background_seed():
+    """
+    Run ensure_seeded() in a daemon thread so no request ever waits on the CSV import.
+    Never waits on a running import itself: server startup calls it from the wsgi module.
+    """
+    global _thread
+    with _thread_lock:
+        if _state['status'] == SEED_READY or (_thread is not None and _thread.is_alive()):
+            return _thread
+        _thread = threading.Thread(target=_seed_in_background, name='kanji-seed', daemon=True)
+        _thread.start()
+    return _thread
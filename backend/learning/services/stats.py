@@ -0,0 +1,171 @@
+"""
+Counter cache behind the dashboard statistics.
+
+StatsSnapshot holds every count the dashboard shows. Writers describe what they changed as a
+StatsDelta and apply it in their own transaction, so the snapshot commits or rolls back with
+the data. Changes whose previous state is unknown (row updates through save(), deletes) mark
+the snapshot stale instead, and the next read recounts it; reconcile_snapshot() recounts on
+demand and reports any drift.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from ..models import Kanji, KanjiReview, StatsSnapshot
+
+
+MASTERED_LEVEL = 5  # mastery level at which a kanji counts as mastered
+SNAPSHOT_ID = 1
+CLASS_FIELDS = ('total', 'reviewed', 'mastered', 'mastery_points')
+
+
+def class_key(class_level):
+    """Key of a class level in StatsSnapshot.classes"""
+    return 'none' if class_level is None else str(class_level)
+
+
+class StatsDelta:
+    """Changes to the snapshot's counters, collected while writing and applied in one go"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def __bool__(self):
+        return any(self.counts.values())
+
+    def kanji(self, class_level, sign=1):
+        """A kanji of `class_level` was added (sign=1) or removed (sign=-1)"""
+        self.counts['total_kanji'] += sign
+        self.counts[('class', class_key(class_level), 'total')] += sign
+
+    def review(self, class_level, mastery_level, review_count, sign=1):
+        """A review row in this state was added (sign=1) or removed (sign=-1)"""
+        key = class_key(class_level)
+        mastered = mastery_level >= MASTERED_LEVEL
+        self.counts['mastered' if mastered else 'learning'] += sign
+        self.counts['total_mastery_points'] += sign * mastery_level
+        self.counts[('level', str(mastery_level))] += sign
+        self.counts[('class', key, 'mastery_points')] += sign * mastery_level
+        if mastered:
+            self.counts[('class', key, 'mastered')] += sign
+        if review_count > 0:
+            self.counts[('class', key, 'reviewed')] += sign
+
+    def review_changed(self, class_level, before, after):
+        """A review row went from `before` to `after`, both (mastery_level, review_count)"""
+        if before != after:
+            self.review(class_level, *before, sign=-1)
+            self.review(class_level, *after)
+
+
+def _add_counts(snapshot, counts):
+    for key, value in counts.items():
+        if not value:
+            continue
+        if isinstance(key, str):
+            setattr(snapshot, key, getattr(snapshot, key) + value)
+        elif key[0] == 'level':
+            count = snapshot.mastery_levels.get(key[1], 0) + value
+            if count:
+                snapshot.mastery_levels[key[1]] = count
+            else:
+                del snapshot.mastery_levels[key[1]]
+        else:
+            _, class_level, field = key
+            class_counts = snapshot.classes.setdefault(class_level, dict.fromkeys(CLASS_FIELDS, 0))
+            class_counts[field] += value
+            if not any(class_counts.values()):
+                del snapshot.classes[class_level]
+
+
+def apply_delta(delta):
+    """
+    Add `delta` to the snapshot inside the caller's transaction. A missing or stale snapshot
+    is left alone: the next read recounts it anyway.
+    """
+    if not delta:
+        return
+    with transaction.atomic(savepoint=False):
+        snapshot = StatsSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_ID, stale=False).first()
+        if snapshot is None:
+            return
+        _add_counts(snapshot, delta.counts)
+        snapshot.save()
+
+
+def mark_stale():
+    """For changes no delta describes: the next read recounts the snapshot"""
+    StatsSnapshot.objects.filter(pk=SNAPSHOT_ID, stale=False).update(stale=True)
+
+
+def count_stats():
+    """Every snapshot counter, counted from the tables with three aggregate queries"""
+    # Every kanji has at most one review row, so the join does not multiply rows
+    counts = Kanji.objects.order_by().aggregate(
+        total_kanji=Count('id'),
+        mastered=Count('reviews', filter=Q(reviews__mastery_level__gte=MASTERED_LEVEL)),
+        learning=Count('reviews', filter=Q(reviews__mastery_level__lt=MASTERED_LEVEL)),
+        total_mastery_points=Coalesce(Sum('reviews__mastery_level'), 0),
+    )
+    counts['mastery_levels'] = {
+        str(row['mastery_level']): row['count']
+        for row in KanjiReview.objects.order_by().values('mastery_level').annotate(count=Count('id'))
+    }
+    counts['classes'] = {
+        class_key(row.pop('class_level')): row
+        for row in Kanji.objects.order_by().values('class_level').annotate(
+            total=Count('id'),
+            reviewed=Count('reviews', filter=Q(reviews__review_count__gt=0)),
+            mastered=Count('reviews', filter=Q(reviews__mastery_level__gte=MASTERED_LEVEL)),
+            mastery_points=Coalesce(Sum('reviews__mastery_level'), 0),
+        )
+    }
+    return counts
+
+
+def reconcile_snapshot(dry_run=False):
+    """
+    Recount the snapshot and store the result (unless `dry_run`).
+    Returns {field: (snapshot value, counted value)} for every field that had drifted.
+    """
+    with transaction.atomic():
+        snapshot = StatsSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_ID).first()
+        counts = count_stats()
+        drift = {
+            field: (getattr(snapshot, field, None), value)
+            for field, value in counts.items() if getattr(snapshot, field, None) != value
+        }
+        if not dry_run and (snapshot is None or snapshot.stale or drift):
+            StatsSnapshot.objects.update_or_create(pk=SNAPSHOT_ID, defaults={**counts, 'stale': False})
+    return drift
+
+
+def get_snapshot():
+    """The current snapshot: one row read, plus a recount when it is missing or stale"""
+    snapshot = StatsSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None or snapshot.stale:
+        reconcile_snapshot()
+        snapshot = StatsSnapshot.objects.get(pk=SNAPSHOT_ID)
+    return snapshot
+
+
+def snapshot_stats(snapshot):
+    """The snapshot in the stats API's shape"""
+    max_possible_points = snapshot.total_kanji * MASTERED_LEVEL
+    mastery_progress = (snapshot.total_mastery_points / max_possible_points * 100) if max_possible_points > 0 else 0
+    classes = sorted(snapshot.classes.items(), key=lambda item: (item[0] != 'none', int(item[0]) if item[0] != 'none' else 0))
+    return {
+        'total_kanji': snapshot.total_kanji,
+        'mastered': snapshot.mastered,
+        'learning': snapshot.learning,
+        'total_mastery_points': snapshot.total_mastery_points,
+        'mastery_progress': round(mastery_progress, 1),
+        'mastery_levels': [
+            {'level': int(level), 'count': count}
+            for level, count in sorted(snapshot.mastery_levels.items(), key=lambda item: int(item[0]), reverse=True)
+        ],
+        'classes': [
+            {'class_level': None if key == 'none' else int(key), **{field: counts[field] for field in CLASS_FIELDS}}
+            for key, counts in classes
+        ],
+    }
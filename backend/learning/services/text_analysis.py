@@ -0,0 +1,223 @@
+from collections import Counter, deque
+from ..models import Kanji, KanjiExample, KanjiReview
+from .lazy_index import LazyIndex
+
+
+# CJK unified ideographs (and extension A), for reporting kanji missing from the catalog
+KANJI_RANGES = (('㐀', '䶿'), ('一', '鿿'))
+
+
+def is_kanji(char):
+    return any(start <= char <= end for start, end in KANJI_RANGES)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every occurrence of all patterns in one pass over the text"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]  # index of the pattern ending at this state, if any
+        self._dict_link = [0]  # nearest state on the fail chain that ends a pattern
+        for index, pattern in enumerate(self.patterns):
+            self._add(pattern, index)
+        self._link()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._dict_link.append(0)
+            state = following
+        self._output[state] = index
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                fail_state = self._fail[following]
+                self._dict_link[following] = (
+                    fail_state if self._output[fail_state] is not None else self._dict_link[fail_state]
+                )
+
+    def count(self, text):
+        """Counter of pattern index -> number of occurrences in `text`"""
+        goto, fail, output, dict_link = self._goto, self._fail, self._output, self._dict_link
+        counts = Counter()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if output[state] is not None else dict_link[state]
+            while match:
+                counts[output[match]] += 1
+                match = dict_link[match]
+        return counts
+
+
+class TextAnalysisIndex(LazyIndex):
+    """
+    Character map of the catalog (character -> kanji) and an Aho–Corasick automaton over
+    KanjiExample.japanese. Kanji changes update the map in place; example changes only mark
+    the automaton stale, and it is rebuilt from memory on the next analysis.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self._characters = {}  # character -> (kanji_id, meaning, class_level)
+        self._kanji_characters = {}  # kanji_id -> character
+        self._examples = {}  # example_id -> (kanji_id, japanese, reading, meaning)
+        self._matcher = None
+        self._pattern_examples = []  # automaton pattern index -> example ids
+
+    def build(self):
+        self.clear()
+        for kanji_id, character, meaning, class_level in Kanji.objects.order_by().values_list(
+            'id', 'character', 'meaning', 'class_level'
+        ):
+            self._characters[character] = (kanji_id, meaning, class_level)
+            self._kanji_characters[kanji_id] = character
+        for example_id, kanji_id, japanese, reading, meaning in KanjiExample.objects.order_by('id').values_list(
+            'id', 'kanji_id', 'japanese', 'reading', 'meaning'
+        ):
+            self._examples[example_id] = (kanji_id, japanese, reading, meaning)
+
+    def _ensure_matcher(self):
+        if self._matcher is None:
+            # Several examples (e.g. under each of its kanji) can share one word
+            by_word = {}
+            for example_id, (_, japanese, _, _) in self._examples.items():
+                if japanese:
+                    by_word.setdefault(japanese, []).append(example_id)
+            self._matcher = AhoCorasick(by_word)
+            self._pattern_examples = list(by_word.values())
+        return self._matcher
+
+    # Incremental updates, applied only once the index has been built
+
+    def kanji_saved(self, kanji):
+        with self._lock:
+            if self._built:
+                self._drop_kanji(kanji.id)
+                self._characters[kanji.character] = (kanji.id, kanji.meaning, kanji.class_level)
+                self._kanji_characters[kanji.id] = kanji.character
+
+    def kanji_deleted(self, kanji_id):
+        with self._lock:
+            if self._built:
+                self._drop_kanji(kanji_id)
+
+    def _drop_kanji(self, kanji_id):
+        character = self._kanji_characters.pop(kanji_id, None)
+        if character is not None and self._characters.get(character, (None,))[0] == kanji_id:
+            del self._characters[character]
+
+    def example_saved(self, example):
+        with self._lock:
+            if self._built:
+                self._examples[example.id] = (example.kanji_id, example.japanese, example.reading, example.meaning)
+                self._matcher = None
+
+    def example_deleted(self, example_id):
+        with self._lock:
+            if self._built:
+                if self._examples.pop(example_id, None) is not None:
+                    self._matcher = None
+
+    # Queries
+
+    def analyze(self, texts):
+        """
+        Analyse each text: catalog kanji with their class level and the learner's mastery,
+        kanji missing from the catalog, and the example words that occur in it.
+        Review state for every text comes from a single query.
+        """
+        self.ensure_built()
+        analyses = []
+        kanji_ids = set()
+        with self._lock:
+            matcher = self._ensure_matcher()
+            for text in texts:
+                character_counts = Counter(text)
+                known = []
+                unknown = []
+                # Counter keeps first-appearance order
+                for character, occurrences in character_counts.items():
+                    entry = self._characters.get(character)
+                    if entry is not None:
+                        kanji_id, meaning, class_level = entry
+                        kanji_ids.add(kanji_id)
+                        known.append({
+                            'id': kanji_id,
+                            'character': character,
+                            'meaning': meaning,
+                            'class_level': class_level,
+                            'occurrences': occurrences,
+                        })
+                    elif is_kanji(character):
+                        unknown.append(character)
+
+                examples = []
+                for pattern, occurrences in sorted(matcher.count(text).items()):
+                    for example_id in self._pattern_examples[pattern]:
+                        kanji_id, japanese, reading, meaning = self._examples[example_id]
+                        examples.append({
+                            'id': example_id,
+                            'kanji_id': kanji_id,
+                            'japanese': japanese,
+                            'reading': reading,
+                            'meaning': meaning,
+                            'occurrences': occurrences,
+                        })
+
+                by_class = Counter(kanji['class_level'] for kanji in known)
+                analyses.append({
+                    'length': len(text),
+                    'kanji': known,
+                    'unknown_kanji': unknown,
+                    'examples': examples,
+                    'by_class': [
+                        {'class_level': class_level, 'count': count}
+                        for class_level, count in sorted(by_class.items(), key=lambda item: (item[0] is not None, item[0] or 0))
+                    ],
+                })
+
+        reviews = {
+            kanji_id: (mastery_level, review_count, correct_count, next_review)
+            for kanji_id, mastery_level, review_count, correct_count, next_review in KanjiReview.objects.filter(
+                kanji_id__in=kanji_ids
+            ).values_list('kanji_id', 'mastery_level', 'review_count', 'correct_count', 'next_review')
+        } if kanji_ids else {}
+        for analysis in analyses:
+            for kanji in analysis['kanji']:
+                mastery_level, review_count, correct_count, next_review = reviews.get(
+                    kanji['id'], (None, 0, 0, None)
+                )
+                kanji.update({
+                    'mastery_level': mastery_level,
+                    'review_count': review_count,
+                    'correct_count': correct_count,
+                    'next_review': next_review,
+                })
+        return analyses
+
+
+text_index = TextAnalysisIndex()
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import CATALOG, REVIEWS, bulk_data_changed, bump_version, bumps_deferred, get_version_numbers
+from .models import Kanji, KanjiReading, KanjiExample, KanjiReview
+from .services.reading_index import reading_index
+from .services.search_index import meaning_index
+from .services.stats import StatsDelta, apply_delta, mark_stale
+from .services.text_analysis import text_index
+
+
+@receiver([post_save, post_delete], sender=Kanji)
+@receiver([post_save, post_delete], sender=KanjiReading)
+@receiver([post_save, post_delete], sender=KanjiExample)
+def catalog_changed(sender, **kwargs):
+    bump_version(CATALOG)
+
+
+@receiver([post_save, post_delete], sender=KanjiReview)
+def reviews_changed(sender, **kwargs):
+    bump_version(REVIEWS)
+
+
+# In-memory indexes follow committed row changes incrementally. catalog_changed() above has
+# already bumped the catalog version for the row, so the indexes learn the version each
+# change produced and can tell a change of their own from one they missed.
+
+CATALOG_INDEXES = (meaning_index, reading_index, text_index)
+INDEX_HOOKS = {
+    Kanji: ('kanji_saved', 'kanji_deleted'),
+    KanjiReading: ('reading_saved', 'reading_deleted'),
+    KanjiExample: ('example_saved', 'example_deleted'),
+}
+
+
+def _update_indexes(hook, *args):
+    version = None if bumps_deferred() else get_version_numbers(CATALOG)[CATALOG]
+
+    def update():
+        for index in CATALOG_INDEXES:
+            index.catalog_written(version, hook, *args)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Kanji)
+@receiver(post_save, sender=KanjiReading)
+@receiver(post_save, sender=KanjiExample)
+def catalog_row_saved(sender, instance, **kwargs):
+    _update_indexes(INDEX_HOOKS[sender][0], instance)
+
+
+@receiver(post_delete, sender=Kanji)
+@receiver(post_delete, sender=KanjiReading)
+@receiver(post_delete, sender=KanjiExample)
+def catalog_row_deleted(sender, instance, **kwargs):
+    # Deleted rows lose their pk once the signals have run, so pass it by value
+    _update_indexes(INDEX_HOOKS[sender][1], instance.pk)
+
+
+@receiver(bulk_data_changed)
+def rebuild_indexes(sender, scopes, **kwargs):
+    # Bulk writes bypass the per-row signals above. Drop the indexes now so this thread sees
+    # its own writes, and again on commit in case another thread rebuilt them in between.
+    if CATALOG in scopes:
+        for index in CATALOG_INDEXES:
+            index.invalidate()
+            transaction.on_commit(index.invalidate)
+
+
+# The stats snapshot follows new rows by deltas; for updates and deletes the previous state
+# is not known here (on delete, not even the kanji's class), so it is recounted on next read
+
+@receiver(post_save, sender=Kanji)
+@receiver(post_save, sender=KanjiReview)
+def stats_row_saved(sender, instance, created, **kwargs):
+    if not created:
+        mark_stale()
+        return
+    delta = StatsDelta()
+    if sender is Kanji:
+        delta.kanji(instance.class_level)
+    else:
+        delta.review(instance.kanji.class_level, instance.mastery_level, instance.review_count)
+    apply_delta(delta)
+
+
+@receiver(post_delete, sender=Kanji)
+@receiver(post_delete, sender=KanjiReview)
+def stats_row_deleted(sender, **kwargs):
+    mark_stale()
@@ -1,3 +1,1436 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .cache import CATALOG, REVIEWS, bump_version, deferred_version_bumps
+from .models import DailyActivity, DataVersion, ImportManifest, Kanji, KanjiReading, KanjiExample, KanjiReview, ReviewLog, StatsSnapshot
+from .serializers import KanjiSerializer, kanji_values, serialize_kanji_rows
+from .services.activity import activity_stats
+from .services.difficulty import load_columns, update_difficulties
+from .services.due_queue import due_queue
+from .services.importer import bulk_import_records, import_csv_files
+from .services.kana import normalize_reading, reading_keys
+from .services.reading_index import reading_index
+from .services.review_selector import DUE, FALLBACK, NEW, REVIEW_FIELDS, review_tiers, select_review_cards
+from .services.reviews import apply_result
+from .services import seeding
+from .services.scheduler import get_scheduler
+from .services.search_index import meaning_index
+from .services.stats import reconcile_snapshot
+from .services.text_analysis import text_index
+from .utils import check_kanji_batch_in_csv, check_kanji_in_csv, get_csv_kanji_index
 
-# Create your tests here.
+
+# Timings depend on the machine, so benchmarks only run on request
+benchmark = skipUnless(os.environ.get('KANJI_BENCHMARKS'), 'set KANJI_BENCHMARKS=1 to run benchmarks')
+
+
+def make_kanji(count, class_level=1):
+    """Bulk-create `count` kanji, each with two readings, two examples and a review entry"""
+    # Bulk writes send no signals; invalidate caches and indexes like the importer does
+    with deferred_version_bumps(CATALOG, REVIEWS):
+        return _make_kanji(count, class_level)
+
+
+def _make_kanji(count, class_level):
+    Kanji.objects.bulk_create([
+        Kanji(character=chr(0x4E00 + i), meaning=f'meaning {i}', class_level=class_level)
+        for i in range(count)
+    ])
+    kanji_list = list(Kanji.objects.all())
+    KanjiReading.objects.bulk_create(
+        [KanjiReading(kanji=kanji, reading='オン', reading_type='onyomi') for kanji in kanji_list]
+        + [KanjiReading(kanji=kanji, reading='くん', reading_type='kunyomi') for kanji in kanji_list]
+    )
+    KanjiExample.objects.bulk_create(
+        [KanjiExample(kanji=kanji, japanese=f'{kanji.character}語', reading='ご', meaning='word')
+         for kanji in kanji_list]
+        + [KanjiExample(kanji=kanji, japanese=f'{kanji.character}人', reading='じん', meaning='person')
+           for kanji in kanji_list]
+    )
+    KanjiReview.objects.bulk_create([KanjiReview(kanji=kanji) for kanji in kanji_list])
+    return kanji_list
+
+
+class CatalogQueryBudgetTest(TestCase):
+    """The catalog and review endpoints must not issue queries per kanji"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def assertCatalogQueries(self, count):
+        make_kanji(count)
+        # ETag aggregate, cache data version, kanji, readings, examples
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/kanji/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), count)
+        self.assertEqual(response.data[0]['readings'], {'onyomi': ['オン'], 'kunyomi': ['くん']})
+        self.assertEqual(len(response.data[0]['examples']), 2)
+
+    def test_catalog_10_kanji(self):
+        self.assertCatalogQueries(10)
+
+    def test_catalog_1000_kanji(self):
+        self.assertCatalogQueries(1000)
+
+    def test_catalog_10000_kanji(self):
+        self.assertCatalogQueries(10000)
+
+    def test_review_card(self):
+        make_kanji(1000)
+        # review queue, kanji, readings, examples
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/review/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['readings'], {'onyomi': ['オン'], 'kunyomi': ['くん']})
+
+
+class CatalogPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_kanji(5, class_level=2)
+        Kanji.objects.create(character='水', meaning='water', class_level=1)
+        Kanji.objects.create(character='火', meaning='fire', class_level=None)
+
+    def test_pages_follow_model_ordering(self):
+        characters = []
+        cursor = None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/kanji/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            characters += [kanji['character'] for kanji in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        # NULL class levels first, then by class level and character
+        expected = ['火', '水'] + [chr(0x4E00 + i) for i in range(5)]
+        self.assertEqual(characters, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/kanji/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/kanji/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        # ETag aggregate and catalog data version
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/kanji/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Readings and examples do not touch the kanji rows, but still change the ETag
+        KanjiReading.objects.create(kanji=Kanji.objects.get(character='水'), reading='みず', reading_type='kunyomi')
+        response = self.client.get('/api/kanji/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        kanji = Kanji.objects.get(character='水')
+        kanji.meaning = 'water/liquid'
+        kanji.save()
+        response = self.client.get('/api/kanji/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_sees_deletions(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Kanji.objects.update(updated_at=an_hour_ago)
+        DataVersion.objects.update(updated_at=an_hour_ago)
+        last_modified = self.client.get('/api/kanji/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/kanji/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Leaves Max(Kanji.updated_at) where it was; only the catalog version moves
+        Kanji.objects.first().delete()
+        response = self.client.get('/api/kanji/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 6)
+
+
+class FastSerializerTest(TestCase):
+    """serialize_kanji_rows() must produce exactly what KanjiSerializer produces, only faster"""
+
+    def setUp(self):
+        make_kanji(2000)
+        # Irregular data: no readings or examples, no class level, several readings of one type
+        bare = Kanji.objects.create(character='水', meaning='water', class_level=None, difficulty='easy')
+        KanjiReview.objects.create(kanji=bare)
+        many = Kanji.objects.create(character='生', meaning='life', class_level=1)
+        for reading, reading_type in [('せい', 'onyomi'), ('いきる', 'kunyomi'), ('しょう', 'onyomi')]:
+            KanjiReading.objects.create(kanji=many, reading=reading, reading_type=reading_type)
+
+    def test_output_matches_model_serializer(self):
+        queryset = Kanji.objects.all()
+        expected = KanjiSerializer(queryset.with_related(), many=True).data
+        actual = serialize_kanji_rows(kanji_values(queryset))
+        self.assertEqual(json.dumps(actual, ensure_ascii=False), json.dumps(expected, ensure_ascii=False))
+
+        page = kanji_values(queryset)[10:20]
+        expected = KanjiSerializer(queryset.with_related()[10:20], many=True).data
+        self.assertEqual(serialize_kanji_rows(page), json.loads(json.dumps(expected)))
+
+    @benchmark
+    def test_benchmark_against_model_serializer(self):
+        queryset = Kanji.objects.all()
+
+        started = time.perf_counter()
+        KanjiSerializer(queryset.with_related(), many=True).data
+        model_serializer_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        serialize_kanji_rows(kanji_values(queryset))
+        fast_path_time = time.perf_counter() - started
+
+        print(
+            f'\nSerializing {queryset.count()} kanji: KanjiSerializer {model_serializer_time * 1000:.0f}ms, '
+            f'fast path {fast_path_time * 1000:.0f}ms ({model_serializer_time / fast_path_time:.1f}x)'
+        )
+        self.assertLess(fast_path_time, model_serializer_time)
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_kanji(3)
+
+    def test_catalog_is_cached_until_data_changes(self):
+        first = self.client.get('/api/kanji/').data
+        # ETag aggregate and data version only
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/kanji/').data, first)
+
+        kanji = Kanji.objects.first()
+        KanjiReading.objects.create(kanji=kanji, reading='あたらしい', reading_type='kunyomi')
+        response = self.client.get('/api/kanji/')
+        self.assertIn('あたらしい', response.data[0]['readings']['kunyomi'])
+
+    def test_stats_follow_review_changes(self):
+        self.assertEqual(self.client.get('/api/stats/').data['mastered'], 0)
+        review = KanjiReview.objects.first()
+        review.mastery_level = 5
+        review.save()
+        self.assertEqual(self.client.get('/api/stats/').data['mastered'], 1)
+
+    def test_counters(self):
+        self.client.get('/api/kanji/')
+        self.client.get('/api/kanji/')
+        stats = self.client.get('/api/cache/').data
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+
+class MeaningSearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_kanji(200)
+        water = Kanji.objects.create(character='水', meaning='water', class_level=1)
+        KanjiExample.objects.create(kanji=water, japanese='水曜日', reading='すいようび', meaning='Wednesday')
+        fire = Kanji.objects.create(character='火', meaning='fire', class_level=1)
+        KanjiExample.objects.create(kanji=fire, japanese='消火', reading='しょうか', meaning='fire fighting; water spraying')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/kanji/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [result['character'] for result in response.data['results']]
+
+    def test_ranking_and_prefixes(self):
+        # Own meaning ranks above an example's meaning
+        self.assertEqual(self.search('water'), ['水', '火'])
+        self.assertEqual(self.search('WAT'), ['水', '火'])
+        self.assertEqual(self.search('water fire'), ['火'])
+        self.assertEqual(self.search('wednes'), ['水'])
+        self.assertEqual(self.search('earth'), [])
+        response = self.client.get('/api/kanji/search/', {'q': 'meaning', 'limit': 5})
+        self.assertEqual(response.data['count'], 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_incremental_updates(self):
+        self.search('water')
+        self.assertTrue(meaning_index.is_built)
+        with self.captureOnCommitCallbacks(execute=True):
+            Kanji.objects.filter(character='水').get().delete()
+            tree = Kanji.objects.create(character='木', meaning='tree; wood', class_level=1)
+            KanjiExample.objects.create(kanji=tree, japanese='木曜日', reading='もくようび', meaning='Thursday')
+        self.assertTrue(meaning_index.is_built)
+        self.assertEqual(self.search('water'), ['火'])
+        self.assertEqual(self.search('wednesday'), [])
+        self.assertEqual(self.search('thu'), ['木'])
+
+    @override_settings(KANJI_INDEX_SYNC_SECONDS=0)
+    def test_own_writes_keep_the_index(self):
+        self.search('water')
+        with self.captureOnCommitCallbacks(execute=True):
+            tree = Kanji.objects.create(character='木', meaning='tree; wood', class_level=1)
+            KanjiExample.objects.create(kanji=tree, japanese='木曜日', reading='もくようび', meaning='Thursday')
+        # The version check finds the index current: no rebuild
+        with self.assertNumQueries(1):
+            total, results = meaning_index.search('thu')
+        self.assertEqual([result['character'] for result in results], ['木'])
+
+        # Another process wrote in between: the next write of this process sees the gap
+        bump_version(CATALOG)
+        with self.captureOnCommitCallbacks(execute=True):
+            KanjiExample.objects.create(kanji=tree, japanese='木材', reading='もくざい', meaning='lumber')
+        self.assertFalse(meaning_index.is_built)
+        self.assertEqual(self.search('lumber'), ['木'])
+
+    def test_changes_from_other_processes(self):
+        def lookups():
+            readings = self.client.get('/api/kanji/readings/', {'q': 'すい'}).data['results'][0]
+            examples = self.client.post('/api/analyze/', {'text': '水道'}, format='json').data['results'][0]['examples']
+            return (
+                self.search('aqua'),
+                [kanji['character'] for kanji in readings['kanji']],
+                [example['japanese'] for example in examples],
+            )
+
+        self.assertEqual(lookups(), ([], [], []))
+        # Written by another process: no signals here, only the catalog version moves
+        water = Kanji.objects.get(character='水')
+        Kanji.objects.filter(pk=water.pk).update(meaning='aqua')
+        KanjiReading.objects.bulk_create([KanjiReading(kanji=water, reading='スイ', reading_type='onyomi')])
+        KanjiExample.objects.bulk_create([KanjiExample(kanji=water, japanese='水道', reading='すいどう', meaning='water supply')])
+        bump_version(CATALOG)
+
+        with override_settings(KANJI_INDEX_SYNC_SECONDS=60):
+            self.assertEqual(lookups(), ([], [], []))
+        with override_settings(KANJI_INDEX_SYNC_SECONDS=0):
+            self.assertEqual(lookups(), (['水'], ['水'], ['水道']))
+            self.assertTrue(all(index.is_built for index in (meaning_index, reading_index, text_index)))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/kanji/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/kanji/search/', {'q': 'water', 'limit': 'x'}).status_code, 400)
+
+
+class ReadingLookupTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_kanji(50)
+        self.sun = Kanji.objects.create(character='日', meaning='sun/day', class_level=1)
+        KanjiReading.objects.create(kanji=self.sun, reading='ニチ', reading_type='onyomi')
+        KanjiReading.objects.create(kanji=self.sun, reading='ひ', reading_type='kunyomi')
+        fire = Kanji.objects.create(character='火', meaning='fire', class_level=1)
+        KanjiReading.objects.create(kanji=fire, reading='ひ', reading_type='kunyomi')
+        bad = Kanji.objects.create(character='悪', meaning='bad', class_level=3)
+        KanjiReading.objects.create(kanji=bad, reading='わる（い）', reading_type='kunyomi')
+
+    def characters(self, result):
+        return [kanji['character'] for kanji in result['kanji']]
+
+    def test_normalisation(self):
+        self.assertEqual(normalize_reading('ニチ'), 'にち')
+        self.assertEqual(normalize_reading('nichi'), 'にち')
+        self.assertEqual(normalize_reading('gakkō'), 'がっこう')
+        self.assertEqual(normalize_reading("kin'en"), 'きんえん')
+        self.assertEqual(reading_keys('わる（い）'), ['わるい', 'わる'])
+        self.assertEqual(reading_keys('-'), [])
+
+    def test_exact_prefix_and_batch(self):
+        response = self.client.get('/api/kanji/readings/', {'q': 'にち,HI,warui'})
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['normalized'] for result in results], ['にち', 'ひ', 'わるい'])
+        self.assertEqual(self.characters(results[0]), ['日'])
+        self.assertEqual(self.characters(results[1]), ['日', '火'])
+        self.assertEqual(self.characters(results[2]), ['悪'])
+
+        response = self.client.get('/api/kanji/readings/', {'q': 'わ', 'match': 'prefix'})
+        self.assertEqual(self.characters(response.data['results'][0]), ['悪'])
+        self.assertEqual(response.data['results'][0]['kanji'][0]['readings'],
+                         [{'reading': 'わる（い）', 'reading_type': 'kunyomi'}])
+
+        response = self.client.post('/api/kanji/readings/', {'readings': ['おん', 'ン']}, format='json')
+        self.assertEqual([result['count'] for result in response.data['results']], [50, 0])
+
+    def test_incremental_updates(self):
+        self.client.get('/api/kanji/readings/', {'q': 'ひ'})
+        with self.captureOnCommitCallbacks(execute=True):
+            KanjiReading.objects.filter(kanji=self.sun, reading='ひ').delete()
+            KanjiReading.objects.create(kanji=self.sun, reading='か', reading_type='kunyomi')
+        self.assertTrue(reading_index.is_built)
+        response = self.client.get('/api/kanji/readings/', {'q': ['hi', 'ka']})
+        self.assertEqual([self.characters(result) for result in response.data['results']], [['火'], ['日']])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/kanji/readings/').status_code, 400)
+        self.assertEqual(self.client.get('/api/kanji/readings/', {'q': 'ひ', 'match': 'fuzzy'}).status_code, 400)
+        self.assertEqual(self.client.post('/api/kanji/readings/', {'readings': 'ひ'}, format='json').status_code, 400)
+
+
+class TextAnalysisTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_kanji(1000)
+        self.water = Kanji.objects.create(character='水', meaning='water', class_level=1)
+        KanjiReview.objects.create(kanji=self.water, mastery_level=3, review_count=4, correct_count=3)
+        KanjiExample.objects.create(kanji=self.water, japanese='水曜日', reading='すいようび', meaning='Wednesday')
+        KanjiExample.objects.create(kanji=self.water, japanese='水', reading='みず', meaning='water')
+
+    def analyze(self, **data):
+        response = self.client.post('/api/analyze/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_kanji_examples_and_mastery(self):
+        result = self.analyze(text='明日は水曜日です。水を飲む。')[0]
+        self.assertEqual([kanji['character'] for kanji in result['kanji']], ['水'])
+        water = result['kanji'][0]
+        self.assertEqual((water['occurrences'], water['mastery_level'], water['review_count']), (2, 3, 4))
+        self.assertEqual(result['unknown_kanji'], ['明', '日', '曜', '飲'])
+        self.assertEqual(
+            sorted((example['japanese'], example['occurrences']) for example in result['examples']),
+            [('水', 2), ('水曜日', 1)]
+        )
+        self.assertEqual(result['by_class'], [{'class_level': 1, 'count': 1}])
+
+    def batch_texts(self):
+        return [''.join(chr(0x4E00 + i) + '語' for i in range(0, 1000, 3)), '水人' * 20000]
+
+    @override_settings(KANJI_INDEX_SYNC_SECONDS=60)
+    def test_batch_without_per_character_queries(self):
+        self.analyze(texts=['warm up'])
+        # Review state only, however many characters and texts
+        with self.assertNumQueries(1):
+            results = self.analyze(texts=self.batch_texts())
+        self.assertEqual(len(results[0]['kanji']), 334)
+        self.assertEqual(len(results[0]['examples']), 334)
+        self.assertEqual(results[1]['kanji'][0]['occurrences'], 20000)
+
+    @benchmark
+    def test_benchmark_batch(self):
+        texts = self.batch_texts()
+        self.analyze(texts=['warm up'])
+        started = time.perf_counter()
+        self.analyze(texts=texts)
+        elapsed = time.perf_counter() - started
+        print(f'\nAnalysing {sum(len(text) for text in texts)} characters: {elapsed * 1000:.0f}ms')
+
+    def test_example_changes(self):
+        self.analyze(text='warm up')
+        with self.captureOnCommitCallbacks(execute=True):
+            KanjiExample.objects.create(kanji=self.water, japanese='水道', reading='すいどう', meaning='water supply')
+        self.assertTrue(text_index.is_built)
+        examples = self.analyze(text='水道')[0]['examples']
+        self.assertEqual([example['japanese'] for example in examples], ['水', '水道'])
+
+    def test_invalid_input(self):
+        self.assertEqual(self.client.post('/api/analyze/', {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/analyze/', {'texts': 'abc'}, format='json').status_code, 400)
+
+
+class ReviewSelectorTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        kanji = make_kanji(6)
+        now = timezone.now()
+        self.reviews = {review.kanji_id: review for review in KanjiReview.objects.all()}
+        # 0, 1: due (1 is older); 2, 3: new but not due; 4, 5: reviewed and not due
+        for index, (next_review, review_count) in enumerate([
+            (now - timedelta(hours=1), 3), (now - timedelta(days=2), 1),
+            (now + timedelta(days=1), 0), (now + timedelta(days=1), 0),
+            (now + timedelta(days=1), 2), (now + timedelta(days=3), 2),
+        ]):
+            KanjiReview.objects.filter(kanji=kanji[index]).update(next_review=next_review, review_count=review_count)
+        self.kanji = kanji
+
+    def test_queue_order(self):
+        rows = select_review_cards(limit=10)
+        order = [self.kanji.index(Kanji(pk=row['kanji_id'])) for row in rows]
+        self.assertEqual(order, [1, 0, 2, 3, 4, 5])
+        self.assertEqual([row['priority'] for row in rows], [DUE, DUE, NEW, NEW, FALLBACK, FALLBACK])
+        self.assertEqual(len(select_review_cards(limit=3, mastery_level=0)), 3)
+        self.assertEqual(select_review_cards(class_level=2), [])
+        self.assertEqual([row['priority'] for row in select_review_cards(limit=2)], [DUE, DUE])
+
+    def test_tiers_are_read_along_indexes(self):
+        # Both queries walk an index in order and stop at the limit: no sort of the matching rows
+        for filters in ({}, {'class_level': 1}, {'mastery_level': 0}, {'exclude_kanji': [self.kanji[0].id]}):
+            by_mastery = filters.get('mastery_level') is not None
+            due, rest = review_tiers(**filters)
+            for reviews, index in (
+                (due, 'review_mastery_next_idx' if by_mastery else 'review_next_review_idx'),
+                (rest, 'review_mastery_count_idx' if by_mastery else 'review_count_idx'),
+            ):
+                plan = reviews.values(*REVIEW_FIELDS)[:10].explain()
+                self.assertNotIn('TEMP B-TREE', plan, filters)
+                self.assertIn(index, plan, filters)
+
+    def test_limit_parameter(self):
+        # selector (due cards, then the rest), kanji, readings, examples
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/review/', {'limit': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([card['id'] for card in response.data['cards']],
+                         [self.kanji[index].id for index in (1, 0, 2, 3)])
+        self.assertEqual(response.data['cards'][0]['readings'], {'onyomi': ['オン'], 'kunyomi': ['くん']})
+
+        self.assertEqual(self.client.get('/api/review/').data['id'], self.kanji[1].id)
+        self.assertEqual(self.client.get('/api/review/', {'limit': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/review/', {'class': 2}).status_code, 404)
+
+
+class ReviewBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kanji = make_kanji(100)
+
+    def submit(self, reviews):
+        response = self.client.post('/api/review/batch/', {'reviews': reviews}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_session_in_constant_queries(self):
+        # Noon yesterday: the whole session falls on one day that already has activity
+        started = (timezone.localtime() - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+        DailyActivity.objects.create(date=started.date(), streak=1)
+        reviews = [
+            {'kanji_id': kanji.id, 'result': 'correct', 'reviewed_at': (started + timedelta(seconds=i)).isoformat()}
+            for i, kanji in enumerate(self.kanji)
+        ]
+        self.client.get('/api/stats/')
+        # savepoint, reviews, bulk update (two statements at SQLite's parameter limit),
+        # review log insert, daily activity update, stats snapshot read and write,
+        # data version bump, release savepoint
+        with self.assertNumQueries(10):
+            data = self.submit(reviews)
+        self.assertEqual(data['applied'], 100)
+        review = KanjiReview.objects.get(kanji=self.kanji[0])
+        self.assertEqual((review.review_count, review.correct_count, review.mastery_level), (1, 1, 1))
+        self.assertEqual(review.last_reviewed, started)
+        self.assertEqual(self.client.get('/api/stats/').data['total_mastery_points'], 100)
+
+        # Re-sending the same session changes nothing
+        data = self.submit(reviews)
+        self.assertEqual(data['applied'], 0)
+        self.assertEqual({item['status'] for item in data['results']}, {'stale'})
+
+    def test_per_item_status(self):
+        kanji = self.kanji[0]
+        KanjiReview.objects.filter(kanji=kanji).delete()
+        earlier = (timezone.now() - timedelta(minutes=5)).isoformat()
+        data = self.submit([
+            {'kanji_id': kanji.id, 'result': 'incorrect'},
+            {'kanji_id': kanji.id, 'result': 'correct', 'reviewed_at': earlier},
+            {'kanji_id': 999999, 'result': 'correct'},
+            {'kanji_id': kanji.id, 'result': 'maybe'},
+            {'kanji_id': kanji.id, 'result': 'hard', 'reviewed_at': 'yesterday'},
+            'not an object',
+        ])
+        self.assertEqual(
+            [item['status'] for item in data['results']],
+            ['applied', 'applied', 'not_found', 'invalid', 'invalid', 'invalid']
+        )
+        # Applied in reviewed_at order: correct (level 1), then incorrect (level 0)
+        self.assertEqual(data['results'][1]['mastery_level'], 1)
+        self.assertEqual(data['results'][0]['mastery_level'], 0)
+        review = KanjiReview.objects.get(kanji=kanji)
+        self.assertEqual((review.review_count, review.correct_count, review.mastery_level), (2, 1, 0))
+
+    def test_invalid_body(self):
+        self.assertEqual(self.client.post('/api/review/batch/', {'reviews': []}, format='json').status_code, 400)
+
+
+class SchedulerTest(TestCase):
+    def answer(self, scheduler, review, results, days_between=None):
+        """Apply answers one after another, each on the day the previous one scheduled"""
+        reviewed_at = timezone.now()
+        intervals = []
+        for result in results:
+            apply_result(review, result, reviewed_at, scheduler)
+            intervals.append(review.interval_days)
+            reviewed_at = review.next_review if days_between is None else reviewed_at + timedelta(days=days_between)
+        return intervals
+
+    def test_legacy_rule(self):
+        review = KanjiReview(kanji=Kanji(character='水'))
+        self.assertEqual(
+            self.answer(get_scheduler('legacy'), review, ['correct'] * 17 + ['hard', 'incorrect']),
+            [2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24, 26, 28, 30, 30, 30, 1, 1]
+        )
+        self.assertEqual((review.mastery_level, review.review_count, review.correct_count), (16, 19, 17))
+
+    def test_sm2(self):
+        review = KanjiReview(kanji=Kanji(character='水'))
+        intervals = self.answer(get_scheduler('sm2'), review, ['correct'] * 4 + ['incorrect', 'correct'])
+        self.assertEqual(intervals, [1, 6, 15, 38, 0, 1])
+        self.assertLess(review.ease_factor, 2.5)
+
+    def test_fsrs(self):
+        review = KanjiReview(kanji=Kanji(character='水'))
+        intervals = self.answer(get_scheduler('fsrs'), review, ['correct'] * 4)
+        self.assertEqual(intervals, sorted(intervals))
+        self.assertGreater(intervals[-1], 30)
+        stability = review.stability
+        self.answer(get_scheduler('fsrs'), review, ['incorrect'])
+        self.assertLess(review.stability, stability)
+        self.assertEqual(review.interval_days, 0)
+        # Lower target retention means longer intervals
+        columns = {
+            'interval_days': [9], 'ease_factor': [2.5], 'stability': [10.0], 'recall_difficulty': [5.0],
+            'review_count': [3], 'correct_count': [3], 'mastery_level': [3],
+        }
+        self.assertLess(
+            get_scheduler('fsrs').initial_state(columns)['interval_days'][0],
+            get_scheduler('fsrs', retention=0.8).initial_state(columns)['interval_days'][0]
+        )
+
+    @override_settings(KANJI_SCHEDULER='sm2')
+    def test_configured_scheduler_and_batch_reschedule(self):
+        kanji = make_kanji(10)
+        self.client.post('/api/review/', {'kanji_id': kanji[0].id, 'result': 'correct'}, format='json')
+        self.assertEqual(KanjiReview.objects.get(kanji=kanji[0]).interval_days, 1)
+
+        reviewed_at = timezone.now() - timedelta(days=1)
+        KanjiReview.objects.exclude(kanji=kanji[0]).update(
+            mastery_level=3, review_count=4, correct_count=3, last_reviewed=reviewed_at
+        )
+        call_command('reschedule_reviews', '--migrate', '--batch-size', '4', stdout=StringIO())
+        review = KanjiReview.objects.get(kanji=kanji[1])
+        self.assertAlmostEqual(review.ease_factor, 2.125)
+        self.assertEqual(review.interval_days, 13)
+        self.assertEqual(review.next_review, reviewed_at + timedelta(days=13))
+        # Untouched: reviewed by SM-2 already, and not migrated again without --migrate
+        self.assertEqual(KanjiReview.objects.get(kanji=kanji[0]).interval_days, 1)
+
+    def test_upgrade_fills_legacy_intervals(self):
+        migration = importlib.import_module('learning.migrations.0006_review_scheduler_state')
+        kanji = make_kanji(3)
+        reviewed_at = timezone.now() - timedelta(days=2)
+        # Scheduled by the legacy rule before the upgrade: mastery 4 after a miss, mastery 3, and a gap past the cap
+        for index, (mastery_level, days) in enumerate([(4, 1), (3, 6), (20, 90)]):
+            KanjiReview.objects.filter(kanji=kanji[index]).update(
+                mastery_level=mastery_level, review_count=5, last_reviewed=reviewed_at,
+                next_review=reviewed_at + timedelta(days=days), interval_days=0
+            )
+        before = dict(KanjiReview.objects.values_list('kanji_id', 'next_review'))
+
+        migration.fill_interval_days(django_apps, connection.schema_editor())
+        self.assertEqual([KanjiReview.objects.get(kanji=k).interval_days for k in kanji], [1, 6, 30])
+        call_command('reschedule_reviews', stdout=StringIO())
+        for review in KanjiReview.objects.filter(kanji__in=kanji[:2]):
+            self.assertEqual(review.next_review, before[review.kanji_id])
+
+    def test_reschedule_keeps_live_schedule(self):
+        kanji = make_kanji(3)
+        for name in ('legacy', 'sm2', 'fsrs'):
+            with self.subTest(scheduler=name), override_settings(KANJI_SCHEDULER=name):
+                # A lapse at mastery 4, a card in progress and a single answer
+                for index, results in enumerate((['correct'] * 5 + ['incorrect'], ['correct'] * 3, ['hard'])):
+                    for result in results:
+                        self.client.post('/api/review/', {'kanji_id': kanji[index].id, 'result': result}, format='json')
+                before = dict(KanjiReview.objects.values_list('kanji_id', 'next_review'))
+                self.assertEqual(KanjiReview.objects.get(kanji=kanji[0]).interval_days, 1 if name == 'legacy' else 0)
+
+                call_command('reschedule_reviews', stdout=StringIO())
+                self.assertEqual(dict(KanjiReview.objects.values_list('kanji_id', 'next_review')), before)
+
+
+class ReviewLogTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kanji = make_kanji(3)
+
+    def test_every_answer_is_logged(self):
+        kanji = self.kanji[0]
+        self.client.post('/api/review/', {'kanji_id': kanji.id, 'result': 'correct', 'response_time_ms': 1800}, format='json')
+        self.client.post('/api/review/', {'kanji_id': kanji.id, 'result': 'correct'}, format='json')
+        self.client.post('/api/review/batch/', {'reviews': [
+            {'kanji_id': kanji.id, 'result': 'hard', 'response_time_ms': 950},
+            {'kanji_id': self.kanji[1].id, 'result': 'incorrect'},
+        ]}, format='json')
+
+        logs = list(ReviewLog.objects.filter(kanji=kanji).order_by('reviewed_at', 'id'))
+        self.assertEqual(
+            [(log.result, log.interval_before, log.interval_after, log.response_time_ms) for log in logs],
+            [('correct', 0, 2, 1800), ('correct', 2, 4, None), ('hard', 4, 1, 950)]
+        )
+        self.assertEqual(ReviewLog.objects.count(), 4)
+
+    def test_compaction(self):
+        now = timezone.now()
+        ReviewLog.objects.bulk_create([
+            ReviewLog(kanji=kanji, reviewed_at=now - timedelta(days=days), result='correct',
+                      interval_before=0, interval_after=1)
+            for kanji in self.kanji[:2] for days in (1, 400, 500, 800)
+        ])
+        stdout = StringIO()
+        call_command('compact_review_log', '--days', '365', '--keep-per-kanji', '3', '--dry-run', stdout=stdout)
+        self.assertIn('Would delete 2 ', stdout.getvalue())
+        self.assertEqual(ReviewLog.objects.count(), 8)
+        call_command('compact_review_log', '--days', '365', '--keep-per-kanji', '3', '--batch-size', '3', stdout=StringIO())
+        # Per kanji: the recent entry and the two next-latest ones are kept
+        self.assertEqual(
+            sorted(ReviewLog.objects.values_list('kanji_id', 'reviewed_at')),
+            sorted((kanji.id, now - timedelta(days=days)) for kanji in self.kanji[:2] for days in (1, 400, 500))
+        )
+        call_command('compact_review_log', '--days', '365', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(ReviewLog.objects.count(), 2)
+
+
+class ConcurrentSubmitTest(TransactionTestCase):
+    """Parallel submits for one card must neither lose updates nor fail"""
+    threads = 8
+    submits_per_thread = 25
+
+    def run_threads(self, target):
+        errors = []
+
+        def worker(thread_index):
+            try:
+                target(thread_index)
+            except Exception as e:  # reported by the test thread
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(self.threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(errors, [])
+        return time.perf_counter() - started
+
+    def submit_in_parallel(self, kanji):
+        """Every thread answers the card `submits_per_thread` times; returns the statuses and the elapsed time"""
+        statuses = []
+
+        def submit(thread_index):
+            client = APIClient()
+            for i in range(self.submits_per_thread):
+                # Every fifth answer of every thread is wrong
+                result = 'incorrect' if i % 5 == 4 else 'correct'
+                response = client.post('/api/review/', {'kanji_id': kanji.id, 'result': result}, format='json')
+                statuses.append(response.status_code)
+
+        elapsed = self.run_threads(submit)
+        return statuses, elapsed
+
+    def test_parallel_submits_for_one_card(self):
+        kanji = make_kanji(1)[0]
+        statuses, _ = self.submit_in_parallel(kanji)
+        total = self.threads * self.submits_per_thread
+
+        self.assertEqual(set(statuses), {200})
+        review = KanjiReview.objects.get(kanji=kanji)
+        self.assertEqual(review.review_count, total)
+        self.assertEqual(review.correct_count, total * 4 // 5)
+        self.assertEqual(ReviewLog.objects.filter(kanji=kanji).count(), total)
+        # Every answer was applied to the state left by the previous one
+        logs = ReviewLog.objects.filter(kanji=kanji).order_by('id')
+        self.assertEqual(
+            [log.interval_before for log in logs][1:],
+            [log.interval_after for log in logs][:-1]
+        )
+
+    @benchmark
+    def test_benchmark_parallel_submits(self):
+        _, elapsed = self.submit_in_parallel(make_kanji(1)[0])
+        total = self.threads * self.submits_per_thread
+        print(f'\n{total} concurrent submits to one card from {self.threads} threads: {total / elapsed:.0f} submits/s')
+
+
+class ReviewSessionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kanji = make_kanji(25)
+        kanji_ids = [kanji.id for kanji in self.kanji]
+        KanjiReview.objects.filter(kanji_id__in=kanji_ids[:5]).update(
+            next_review=timezone.now() - timedelta(days=1), review_count=2
+        )
+
+    def test_batches_without_repeats(self):
+        served = []
+        session = None
+        # selector (due cards, then the rest if the limit is not reached), then kanji, readings,
+        # examples (new cards are due from creation: 10 due; 10 due; 5 due and no others; nothing left)
+        for expected, queries in ((10, 4), (10, 4), (5, 5), (0, 2)):
+            params = {'limit': 10}
+            if session:
+                params['session'] = session
+            with self.assertNumQueries(queries):
+                response = self.client.get('/api/review/session/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], expected)
+            served += [card['id'] for card in response.data['cards']]
+            session = response.data['session']
+            if expected == 10 and len(served) == 10:
+                first = response.data['cards'][0]
+                self.assertEqual(first['priority'], 'due')
+                self.assertEqual(first['review_count'], 2)
+                self.assertEqual(first['readings'], {'onyomi': ['オン'], 'kunyomi': ['くん']})
+        self.assertEqual(sorted(served), sorted(kanji.id for kanji in self.kanji))
+
+    def test_session_keeps_its_filters(self):
+        response = self.client.get('/api/review/session/', {'limit': 3, 'mastery_level': 4})
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/api/review/session/', {'limit': 3, 'session': response.data['session']})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_tampered_session(self):
+        session = self.client.get('/api/review/session/').data['session']
+        response = self.client.get('/api/review/session/', {'session': session[:-2] + 'xx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/review/session/', {'limit': 500}).status_code, 400)
+
+
+@override_settings(KANJI_DUE_QUEUE=True, KANJI_DUE_QUEUE_SYNC_SECONDS=0)
+class DueQueueTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        due_queue.clear()
+        self.kanji = make_kanji(30, class_level=1)
+        now = timezone.now()
+        for i, kanji in enumerate(self.kanji):
+            KanjiReview.objects.filter(kanji=kanji).update(
+                next_review=now + timedelta(hours=(i * 7) % 30 - 10),
+                review_count=i % 3,
+                mastery_level=i % 4,
+            )
+        Kanji.objects.filter(pk__in=[kanji.id for kanji in self.kanji[::2]]).update(class_level=2)
+        bump_version(CATALOG, REVIEWS)
+
+    def test_same_order_as_sql_selector(self):
+        now = timezone.now()
+        for filters in ({}, {'class_level': 2}, {'mastery_level': 1}, {'class_level': 1, 'mastery_level': 3}):
+            for limit in (1, 5, 40):
+                self.assertEqual(
+                    due_queue.select(limit=limit, now=now, **filters),
+                    select_review_cards(limit=limit, now=now, **filters),
+                    (filters, limit)
+                )
+        exclude = [kanji.id for kanji in self.kanji[:10]]
+        self.assertEqual(
+            due_queue.select(limit=40, exclude_kanji=exclude, now=now),
+            select_review_cards(limit=40, exclude_kanji=exclude, now=now)
+        )
+
+    def test_write_through_and_resync(self):
+        first = self.client.get('/api/review/').data['id']
+        # version check, kanji, readings, examples
+        with self.assertNumQueries(4):
+            self.client.get('/api/review/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/review/', {'kanji_id': first, 'result': 'correct'}, format='json')
+        # Applied write-through: no reload, and the answered card has moved back in the queue
+        with self.assertNumQueries(4):
+            second = self.client.get('/api/review/').data['id']
+        self.assertNotEqual(second, first)
+        self.assertEqual(due_queue.select(limit=30), select_review_cards(limit=30))
+
+        # A change the queue was not told about is picked up through the data version
+        KanjiReview.objects.filter(kanji_id=second).update(next_review=timezone.now() + timedelta(days=5))
+        bump_version(REVIEWS)
+        self.assertNotEqual(self.client.get('/api/review/').data['id'], second)
+        self.assertEqual(due_queue.select(limit=30), select_review_cards(limit=30))
+
+    @override_settings(KANJI_DUE_QUEUE_SYNC_SECONDS=60)
+    def test_superseded_entries_are_compacted(self):
+        due_queue.select(limit=1)
+        due_queue.select(limit=1, mastery_level=1)
+        # Answer the same few cards over and over, so nothing ever pops their old entries
+        kanji_ids = [self.kanji[i].id for i in (1, 5, 9)]
+        for _ in range(20):
+            for kanji_id in kanji_ids:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.post('/api/review/', {'kanji_id': kanji_id, 'result': 'correct'}, format='json')
+        self.assertTrue(due_queue.is_loaded)
+        for key, live in (((None, None), 30), ((None, 1), 8)):
+            for heap in due_queue._heaps[key]:
+                self.assertLessEqual(len(heap), live * 3 // 2 + 1, key)
+        now = timezone.now()
+        for filters in ({}, {'mastery_level': 1}):
+            self.assertEqual(due_queue.select(limit=40, now=now, **filters),
+                             select_review_cards(limit=40, now=now, **filters))
+
+    @benchmark
+    @override_settings(KANJI_DUE_QUEUE_SYNC_SECONDS=60)
+    def test_benchmark_against_sql(self):
+        count = 100_000
+        # Any characters will do; skip the surrogate range
+        characters = (chr(0x5000 + i if 0x5000 + i < 0xD800 else 0xE000 + i) for i in range(count))
+        Kanji.objects.bulk_create(
+            [Kanji(character=character, meaning='benchmark', class_level=i % 6 + 1) for i, character in enumerate(characters)],
+            batch_size=5000
+        )
+        now = timezone.now()
+        KanjiReview.objects.bulk_create([
+            KanjiReview(kanji_id=kanji_id, next_review=now + timedelta(minutes=(kanji_id * 37) % 20000 - 10000),
+                        review_count=kanji_id % 3, mastery_level=kanji_id % 6)
+            for kanji_id in Kanji.objects.filter(meaning='benchmark').values_list('id', flat=True)
+        ], batch_size=5000)
+        bump_version(CATALOG, REVIEWS)
+
+        started = time.perf_counter()
+        due_queue.load()
+        load_time = time.perf_counter() - started
+
+        rounds = 200
+        for label, select in (('SQL', select_review_cards), ('queue', due_queue.select)):
+            for filters in ({}, {'class_level': 3}, {'mastery_level': 2}):
+                select(**filters)  # builds the filter's heaps
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    select(**filters)
+                elapsed = (time.perf_counter() - started) / rounds
+                print(f'\n{label} next card at {count} cards {filters or "(no filter)"}: {elapsed * 1000:.3f}ms', end='')
+        print(f'\nqueue load: {load_time * 1000:.0f}ms')
+
+
+class DifficultyTest(TestCase):
+    def test_difficulty_from_reviews_and_class(self):
+        kanji = make_kanji(4, class_level=3)
+        now = timezone.now()
+        KanjiReview.objects.filter(kanji=kanji[0]).update(review_count=40, correct_count=40)
+        KanjiReview.objects.filter(kanji=kanji[1]).update(review_count=20, correct_count=8)
+        ReviewLog.objects.bulk_create([
+            ReviewLog(kanji=kanji[1], reviewed_at=now, result='incorrect', interval_before=4, interval_after=0)
+            for _ in range(6)
+        ])
+        Kanji.objects.filter(pk=kanji[3].pk).update(class_level=6)
+
+        # Catalog columns plus lapses, in one query
+        with self.assertNumQueries(1):
+            columns = load_columns()
+        self.assertEqual(columns['lapses'][columns['id'].index(kanji[1].id)], 6)
+
+        stdout = StringIO()
+        call_command('compute_difficulty', stdout=stdout)
+        self.assertIn('Changed 3 of 4 kanji', stdout.getvalue())
+        difficulties = dict(Kanji.objects.values_list('id', 'difficulty'))
+        self.assertEqual(
+            [difficulties[k.id] for k in kanji],
+            ['easy', 'hard', 'medium', 'hard']
+        )
+        # Nothing left to change on a second run
+        self.assertEqual(update_difficulties().changed, 0)
+
+
+class StatsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stats_are_a_single_row_read(self):
+        for count in (10, 1000):
+            Kanji.objects.all().delete()
+            kanji = make_kanji(count)
+            KanjiReview.objects.filter(kanji__in=kanji[:count // 2]).update(mastery_level=5, review_count=3)
+            call_command('reconcile_stats', stdout=StringIO())
+            # Snapshot row, the live due count and the daily activity range
+            with self.assertNumQueries(3):
+                stats = self.client.get('/api/stats/').data
+            self.assertEqual(stats['total_kanji'], count)
+            self.assertEqual(stats['mastered'], count // 2)
+            self.assertEqual(stats['learning'], count - count // 2)
+            self.assertEqual(stats['total_mastery_points'], count // 2 * 5)
+            self.assertEqual(stats['mastery_progress'], 50.0)
+
+    def test_writers_keep_the_snapshot_exact(self):
+        kanji = make_kanji(5)
+        self.client.get('/api/stats/')
+        for _ in range(5):
+            self.client.post('/api/review/', {'kanji_id': kanji[0].id, 'result': 'correct'}, format='json')
+        self.client.post('/api/review/', {'kanji_id': kanji[1].id, 'result': 'hard'}, format='json')
+        KanjiReview.objects.filter(kanji=kanji[2]).delete()
+        call_command('reconcile_stats', stdout=StringIO())
+        self.client.post('/api/review/batch/', {'reviews': [
+            {'kanji_id': kanji[2].id, 'result': 'correct'},
+            {'kanji_id': kanji[3].id, 'result': 'incorrect'},
+        ]}, format='json')
+        response = self.client.post('/api/kanji/', {'character': '鬱', 'meaning': 'gloom', 'class_level': 4}, format='json')
+        self.assertEqual(response.status_code, 201)
+        bulk_import_records([
+            {'character': '水', 'meaning': 'water', 'class_level': 2, 'onyomi': [], 'kunyomi': [], 'examples': []},
+            {'character': kanji[0].character, 'meaning': 'moved', 'class_level': 3,
+             'onyomi': [], 'kunyomi': [], 'examples': []},
+        ])
+
+        snapshot = StatsSnapshot.objects.get()
+        self.assertFalse(snapshot.stale)
+        self.assertEqual(reconcile_snapshot(dry_run=True), {})
+        stats = self.client.get('/api/stats/').data
+        self.assertEqual((stats['total_kanji'], stats['mastered'], stats['total_mastery_points']), (7, 1, 6))
+        self.assertEqual(stats['classes'][-1], {
+            'class_level': 4, 'total': 1, 'reviewed': 0, 'mastered': 0, 'mastery_points': 0
+        })
+
+    def test_reconcile_repairs_drift(self):
+        make_kanji(3)
+        self.client.get('/api/stats/')
+        # Raw updates bypass the deltas
+        KanjiReview.objects.update(mastery_level=5)
+        self.assertEqual(self.client.get('/api/stats/').data['mastered'], 0)
+        stdout = StringIO()
+        call_command('reconcile_stats', stdout=stdout)
+        self.assertIn('mastered: 0 -> 3', stdout.getvalue())
+        self.assertEqual(self.client.get('/api/stats/').data['mastered'], 3)
+        stdout = StringIO()
+        call_command('reconcile_stats', stdout=stdout)
+        self.assertIn('up to date', stdout.getvalue())
+
+        # Saves whose previous state is unknown make the next read recount
+        review = KanjiReview.objects.first()
+        review.mastery_level = 0
+        review.save()
+        self.assertTrue(StatsSnapshot.objects.get().stale)
+        self.assertEqual(self.client.get('/api/stats/').data['mastered'], 2)
+
+    def test_breakdowns(self):
+        kanji = make_kanji(4)
+        Kanji.objects.filter(pk=kanji[3].pk).update(class_level=2)
+        Kanji.objects.create(character='水', meaning='water', class_level=2)
+        KanjiReview.objects.filter(kanji=kanji[0]).update(mastery_level=6, review_count=9)
+        KanjiReview.objects.filter(kanji=kanji[3]).update(
+            mastery_level=2, review_count=2, next_review=timezone.now() + timedelta(days=1)
+        )
+        bump_version(CATALOG, REVIEWS)
+
+        stats = self.client.get('/api/stats/').data
+        self.assertEqual(stats['due_for_review'], 3)
+        self.assertEqual(stats['mastery_levels'], [
+            {'level': 6, 'count': 1}, {'level': 2, 'count': 1}, {'level': 0, 'count': 2},
+        ])
+        self.assertEqual(stats['classes'], [
+            {'class_level': 1, 'total': 3, 'reviewed': 1, 'mastered': 1, 'mastery_points': 6},
+            {'class_level': 2, 'total': 2, 'reviewed': 1, 'mastered': 0, 'mastery_points': 2},
+        ])
+
+        response = self.client.get('/api/stats/levels/0/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [k['character'] for k in response.data['kanji']], [kanji[1].character, kanji[2].character]
+        )
+        self.assertEqual(self.client.get('/api/stats/levels/4/').data['kanji'], [])
+
+
+class DailyActivityTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kanji = make_kanji(4)
+        self.now = timezone.now()
+
+    def submit_batch(self, *answers):
+        self.client.post('/api/review/batch/', {'reviews': [
+            {'kanji_id': kanji.id, 'result': result, 'reviewed_at': (self.now - timedelta(days=days)).isoformat()}
+            for kanji, result, days in answers
+        ]}, format='json')
+
+    def streaks(self):
+        return list(DailyActivity.objects.values_list('reviews', 'correct', 'new_cards', 'streak'))
+
+    def test_rollups_streak_and_accuracy(self):
+        self.submit_batch((self.kanji[0], 'correct', 3), (self.kanji[1], 'incorrect', 1))
+        self.client.post('/api/review/', {'kanji_id': self.kanji[2].id, 'result': 'correct'}, format='json')
+        self.client.post('/api/review/', {'kanji_id': self.kanji[2].id, 'result': 'incorrect'}, format='json')
+        self.assertEqual(self.streaks(), [(1, 1, 1, 1), (1, 0, 1, 1), (2, 1, 1, 2)])
+
+        stats = self.client.get('/api/stats/').data
+        self.assertEqual(stats['streak'], 2)
+        self.assertEqual(stats['accuracy_7d'], 50.0)
+        self.assertEqual(stats['heatmap'][-1], {
+            'date': timezone.localdate().isoformat(), 'reviews': 2, 'correct': 1, 'new_cards': 1
+        })
+
+        # An offline session filling the gap joins the runs on both sides
+        self.submit_batch((self.kanji[3], 'correct', 2))
+        self.assertEqual([row[3] for row in self.streaks()], [1, 2, 3, 4])
+        with self.assertNumQueries(1):
+            self.assertEqual(activity_stats()['streak'], 4)
+
+        # Today without answers yet keeps yesterday's streak; a missed day ends it
+        self.assertEqual(activity_stats(today=timezone.localdate() + timedelta(days=1))['streak'], 4)
+        self.assertEqual(activity_stats(today=timezone.localdate() + timedelta(days=2))['streak'], 0)
+
+        # The review log rebuilds the same rollups
+        maintained = self.streaks()
+        call_command('rebuild_activity', stdout=StringIO())
+        self.assertEqual(self.streaks(), maintained)
+
+
+CSV_HEADER = 'character,meaning,onyomi,kunyomi,example\n'
+
+
+def catalog_contents():
+    """Every kanji with its readings, examples and review state"""
+    return {
+        kanji.character: (
+            kanji.meaning,
+            kanji.class_level,
+            sorted(kanji.readings.values_list('reading_type', 'reading')),
+            sorted(kanji.examples.values_list('japanese', 'reading', 'meaning')),
+            list(kanji.reviews.values_list('mastery_level', 'review_count')),
+        )
+        for kanji in Kanji.objects.all()
+    }
+
+
+KANJIDIC_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<kanjidic2>
+  <header><file_version>4</file_version></header>
+  <character>
+    <literal>日</literal>
+    <misc><grade>1</grade></misc>
+    <reading_meaning><rmgroup>
+      <reading r_type="pinyin">ri4</reading>
+      <reading r_type="ja_on">ニチ</reading>
+      <reading r_type="ja_on">ジツ</reading>
+      <reading r_type="ja_kun">ひ</reading>
+      <meaning>day</meaning>
+      <meaning>sun</meaning>
+      <meaning m_lang="fr">jour</meaning>
+    </rmgroup></reading_meaning>
+  </character>
+  <character>
+    <literal>鬱</literal>
+    <misc><grade>8</grade></misc>
+    <reading_meaning><rmgroup>
+      <reading r_type="ja_on">ウツ</reading>
+      <meaning>gloom</meaning>
+    </rmgroup></reading_meaning>
+  </character>
+</kanjidic2>
+"""
+
+
+class CsvImportTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_class_file(self, class_num, rows):
+        path = os.path.join(self.directory, f'kanji_class_{class_num}.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(CSV_HEADER + ''.join(f'{row}\n' for row in rows))
+        return (path, class_num)
+
+    def import_files(self, files, **options):
+        return {class_num: result for _, class_num, result in import_csv_files(files, **options)}
+
+    def test_prune_keeps_kanji_moved_to_another_file(self):
+        files = [
+            self.write_class_file(3, ['悪, bad, アク, わる（い）, 悪人::あくにん::bad guy', '安, cheap, アン, やす（い）,']),
+            self.write_class_file(4, ['愛, love, アイ, ,']),
+        ]
+        self.import_files(files)
+        moved = Kanji.objects.get(character='悪')
+        KanjiReview.objects.filter(kanji=moved).update(review_count=9)
+
+        # 悪 moves from class 3 to class 4; 安 is gone from every file
+        files = [
+            self.write_class_file(3, []),
+            self.write_class_file(4, ['愛, love, アイ, ,', '悪, bad, アク, わる（い）, 悪人::あくにん::bad guy']),
+        ]
+        results = self.import_files(files, prune=True)
+        self.assertEqual(results[3].missing, ['安'])
+        self.assertEqual(results[3].removed, 1)
+
+        kanji = Kanji.objects.get(character='悪')
+        self.assertEqual((kanji.id, kanji.class_level), (moved.id, 4))
+        self.assertEqual(KanjiReview.objects.get(kanji=kanji).review_count, 9)
+        self.assertFalse(Kanji.objects.filter(character='安').exists())
+        self.assertEqual(ImportManifest.objects.get(class_level=3).row_hashes, {})
+
+    def test_import_class_file(self):
+        files = [self.write_class_file(2, [
+            '生,life/birth,せい・しょう,いきる・うまれる,学生::がくせい::student||生きる::いきる::to live',
+            '時,time/hour,じ,とき,',
+            ',no character,,,',
+        ])]
+        results = self.import_files(files)
+        self.assertEqual((results[2].created, results[2].updated, results[2].rows), (2, 0, 2))
+        self.assertEqual(catalog_contents(), {
+            '生': (
+                'life/birth', 2,
+                [('kunyomi', 'いきる'), ('kunyomi', 'うまれる'), ('onyomi', 'しょう'), ('onyomi', 'せい')],
+                [('学生', 'がくせい', 'student'), ('生きる', 'いきる', 'to live')],
+                [(0, 0)],
+            ),
+            '時': ('time/hour', 2, [('kunyomi', 'とき'), ('onyomi', 'じ')], [], [(0, 0)]),
+        })
+        self.assertEqual(sorted(ImportManifest.objects.get(class_level=2).row_hashes), ['時', '生'])
+
+    def test_reimport_skips_unchanged_files_and_rows(self):
+        rows = ['水, water, スイ, みず,', '火, fire, カ, ひ,', '日, day, ニチ, ひ,']
+        files = [self.write_class_file(1, rows)]
+        self.import_files(files)
+        KanjiReview.objects.filter(kanji__character='水').update(review_count=3)
+
+        # Same bytes: the file is skipped after the manifest check
+        with self.assertNumQueries(2):
+            results = self.import_files(files)
+        self.assertTrue(results[1].file_skipped)
+        self.assertEqual(results[1].unchanged, 3)
+
+        # One edited row, one row gone: only the edited row is written, the gone one is reported
+        files = [self.write_class_file(1, ['水, water, スイ, みず,', '火, flame, カ, ひ,'])]
+        results = self.import_files(files)
+        self.assertEqual((results[1].created, results[1].updated, results[1].unchanged), (0, 1, 1))
+        self.assertEqual(results[1].missing, ['日'])
+        self.assertEqual(Kanji.objects.get(character='火').meaning, 'flame')
+        self.assertTrue(Kanji.objects.filter(character='日').exists())
+        self.assertEqual(KanjiReview.objects.get(kanji__character='水').review_count, 3)
+
+        # A kanji deleted from the database comes back although its file is unchanged
+        Kanji.objects.filter(character='水').delete()
+        results = self.import_files(files)
+        self.assertFalse(results[1].file_skipped)
+        self.assertEqual((results[1].created, results[1].unchanged), (1, 1))
+
+        # --full rewrites every row
+        results = self.import_files(files, full=True)
+        self.assertEqual((results[1].updated, results[1].unchanged), (2, 0))
+
+    def test_parallel_parsing_matches_serial(self):
+        files = [
+            self.write_class_file(1, ['水, water, スイ, みず, 水道::すいどう::water supply', '明, bright, メイ, あか（るい）,']),
+            self.write_class_file(2, ['明, light, メイ・ミョウ, あか（るい）,', '火, fire, カ, ひ, 火山::かざん::volcano']),
+            self.write_class_file(3, ['日, day, ニチ・ジツ, ひ・か, 日本::にほん::Japan']),
+        ]
+        self.import_files(files, workers=1)
+        serial = catalog_contents()
+        Kanji.objects.all().delete()
+        ImportManifest.objects.all().delete()
+
+        results = self.import_files(files, workers=2)
+        self.assertEqual(catalog_contents(), serial)
+        # Later files win on duplicates
+        self.assertEqual(serial['明'][:2], ('light', 2))
+        self.assertEqual(sum(result.created for result in results.values()), 4)
+
+    def test_invalid_options_clear_nothing(self):
+        self.import_files([self.write_class_file(1, ['水, water, スイ, みず,'])])
+        for option in (['--batch-size', '0'], ['--workers', '-1']):
+            out = StringIO()
+            call_command('import_kanji_csv', '--clear', '--all', *option, stdout=out)
+            self.assertIn('must be', out.getvalue())
+            self.assertNotIn('Cleared', out.getvalue())
+        self.assertTrue(Kanji.objects.filter(character='水').exists())
+        self.assertTrue(ImportManifest.objects.exists())
+
+    def test_stream_tsv_source(self):
+        path = os.path.join(self.directory, 'dictionary.tsv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('character\tmeaning\tonyomi\tkunyomi\texample\tgrade\n')
+            f.write('水\twater\tスイ\tみず\t水道::すいどう::water supply\t1\n')
+            f.write('鬱\tgloom\tウツ\t\t\t\n')
+        out = StringIO()
+        call_command('import_kanji_csv', '--source', path, '--class', '7', '--batch-size', '1', stdout=out)
+        self.assertIn('(tsv)', out.getvalue())
+        self.assertIn('2 rows committed', out.getvalue())
+        self.assertEqual(catalog_contents(), {
+            '水': ('water', 1, [('kunyomi', 'みず'), ('onyomi', 'スイ')], [('水道', 'すいどう', 'water supply')], [(0, 0)]),
+            '鬱': ('gloom', 7, [('onyomi', 'ウツ')], [], [(0, 0)]),
+        })
+
+    def write_kanjidic(self):
+        path = os.path.join(self.directory, 'kanjidic2.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(KANJIDIC_XML)
+        return path
+
+    def test_stream_kanjidic_source(self):
+        out = StringIO()
+        call_command('import_kanji_csv', '--source', self.write_kanjidic(), stdout=out)
+        self.assertIn('(xml)', out.getvalue())
+        self.assertEqual(catalog_contents(), {
+            '日': ('day/sun', 1, [('kunyomi', 'ひ'), ('onyomi', 'ジツ'), ('onyomi', 'ニチ')], [], [(0, 0)]),
+            '鬱': ('gloom', None, [('onyomi', 'ウツ')], [], [(0, 0)]),
+        })
+
+    def test_stream_kanjidic_over_class_files(self):
+        self.import_files([
+            self.write_class_file(1, ['日, day, ニチ, ひ, 日本::にほん::Japan']),
+            self.write_class_file(5, ['鬱, depression, ウツ, ふさ（ぐ）, 鬱病::うつびょう::depression']),
+        ])
+        KanjiReview.objects.filter(kanji__character='鬱').update(review_count=2)
+        reconcile_snapshot()
+
+        # The dictionary has no examples and no class for 鬱: both are kept, the rest is updated
+        call_command('import_kanji_csv', '--source', self.write_kanjidic(), stdout=StringIO())
+        self.assertEqual(catalog_contents(), {
+            '日': ('day/sun', 1, [('kunyomi', 'ひ'), ('onyomi', 'ジツ'), ('onyomi', 'ニチ')],
+                  [('日本', 'にほん', 'Japan')], [(0, 0)]),
+            '鬱': ('gloom', 5, [('onyomi', 'ウツ')], [('鬱病', 'うつびょう', 'depression')], [(0, 2)]),
+        })
+        self.assertEqual(reconcile_snapshot(dry_run=True), {})
+
+
+class KanjiExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kanji = make_kanji(3)
+        Kanji.objects.filter(pk=self.kanji[2].pk).update(class_level=None)
+
+    def export(self, **params):
+        response = self.client.get('/api/kanji/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        self.assertIn('filename="kanji.ndjson"', response['Content-Disposition'])
+        records = {
+            record['character']: record
+            for record in map(json.loads, body.decode('utf-8').splitlines())
+        }
+        self.assertEqual(sorted(records), sorted(kanji.character for kanji in self.kanji))
+        record = records[self.kanji[0].character]
+        self.assertEqual((record['onyomi'], record['kunyomi'], record['class_level']), (['オン'], ['くん'], 1))
+        self.assertEqual(len(record['examples']), 2)
+        self.assertIsNone(records[self.kanji[2].character]['class_level'])
+
+    def test_csv_round_trip(self):
+        response, body = self.export(format='csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        lines = body.decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'character,meaning,onyomi,kunyomi,example,class_level')
+        self.assertEqual(len(lines), 4)
+
+        exported = catalog_contents()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'kanji.csv')
+        with open(path, 'wb') as f:
+            f.write(body)
+        Kanji.objects.all().delete()
+        call_command('import_kanji_csv', '--source', path, stdout=StringIO())
+        self.assertEqual(catalog_contents(), exported)
+
+    def test_gzip(self):
+        for export_format in ('ndjson', 'csv'):
+            response, body = self.export(format=export_format, compress='gzip')
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            self.assertIn(f'filename="kanji.{export_format}.gz"', response['Content-Disposition'])
+            self.assertEqual(gzip.decompress(body), self.export(format=export_format)[1])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/kanji/export/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/kanji/export/', {'compress': 'zip'}).status_code, 400)
+
+
+class CsvIndexTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.data_dir = os.path.join(directory.name, 'kanji_data')
+        os.mkdir(self.data_dir)
+        settings_override = override_settings(BASE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.write(1, ['水,water,スイ,みず,', '日,day,ニチ,ひ,'])
+        self.write(2, ['明,bright,メイ,あか（るい）,', '水,water,スイ,みず,'])
+
+    def write(self, class_num, rows):
+        path = os.path.join(self.data_dir, f'kanji_class_{class_num}.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(CSV_HEADER + ''.join(f'{row}\n' for row in rows))
+        return path
+
+    def test_index_is_reused_until_a_file_changes(self):
+        index = get_csv_kanji_index()
+        self.assertEqual(index, {'水': 1, '日': 1, '明': 2})
+        self.assertIs(get_csv_kanji_index(), index)
+
+        # Touched: rebuilt although the content is the same
+        path = os.path.join(self.data_dir, 'kanji_class_2.csv')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        rebuilt = get_csv_kanji_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt, index)
+        self.assertIs(get_csv_kanji_index(), rebuilt)
+
+        # Same mtime, new size: rebuilt with the new row
+        stat = os.stat(path)
+        self.write(2, ['明,bright,メイ,あか（るい）,', '火,fire,カ,ひ,'])
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(get_csv_kanji_index(), {'水': 1, '日': 1, '明': 2, '火': 2})
+
+        # A new class file counts as a change too
+        self.write(3, ['愛,love,アイ,,'])
+        self.assertEqual(check_kanji_in_csv('愛'), 3)
+
+    def test_batch_lookup_matches_single_lookups(self):
+        characters = ['水', '明', '日', '悪', '']
+        self.assertEqual(
+            check_kanji_batch_in_csv(characters),
+            {character: check_kanji_in_csv(character) for character in characters if check_kanji_in_csv(character)}
+        )
+        self.assertEqual(check_kanji_batch_in_csv(characters), {'水': 1, '明': 2, '日': 1})
+        self.assertIsNone(check_kanji_in_csv('悪'))
+
+
+class SeedingTest(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        os.mkdir(os.path.join(directory.name, 'kanji_data'))
+        with open(os.path.join(directory.name, 'kanji_data', 'kanji_class_1.csv'), 'w', encoding='utf-8') as f:
+            f.write(CSV_HEADER + '水,water,スイ,みず,\n日,day,ニチ,ひ,\n')
+        settings_override = override_settings(BASE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Seeding state is per process; start from scratch and restore it afterwards
+        self.addCleanup(seeding._state.update, dict(seeding._state))
+        seeding._state.update(status=seeding.SEED_PENDING, imported=False, error=None, started_at=None, finished_at=None)
+
+    def test_ensure_seeded_and_health(self):
+        client = APIClient()
+        response = client.get('/api/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual((response.data['ready'], response.data['seed']['status']), (False, 'pending'))
+
+        self.assertTrue(seeding.ensure_seeded())
+        self.assertEqual(sorted(Kanji.objects.values_list('character', flat=True)), ['日', '水'])
+        self.assertEqual(KanjiReview.objects.count(), 2)
+        with self.assertNumQueries(0):
+            self.assertTrue(seeding.ensure_seeded())
+
+        response = client.get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['ready'], response.data['seed']['status']), (True, 'ready'))
+        self.assertTrue(response.data['seed']['imported'])
+
+    def test_background_start_does_not_wait_for_import(self):
+        started = []
+
+        def start():
+            started.append(seeding.start_background_seed())
+
+        # An import is running (e.g. the seed_kanji command in this process)
+        with seeding._lock:
+            for _ in range(2):
+                caller = threading.Thread(target=start, daemon=True)
+                caller.start()
+                caller.join(timeout=5)
+                self.assertFalse(caller.is_alive())
+            self.assertIs(started[0], started[1])
+            self.assertFalse(seeding.is_seeded())
+
+        started[0].join(timeout=10)
+        self.assertTrue(seeding.is_seeded())
+        self.assertEqual(Kanji.objects.count(), 2)
@@ -1,11 +1,24 @@
 from django.urls import path
-from .views.review import ReviewView
-from .views.stats import StatsView
+from .views.review import ReviewView, ReviewBatchView, ReviewSessionView
+from .views.stats import StatsView, MasteryLevelKanjiView
 from .views.kanji import KanjiView
+from .views.health import HealthView, CacheStatsView
+from .views.export import KanjiExportView
+from .views.search import KanjiSearchView, KanjiReadingLookupView
+from .views.analysis import TextAnalysisView
 
 urlpatterns = [
     path('review/', ReviewView.as_view(), name='review'),
+    path('review/batch/', ReviewBatchView.as_view(), name='review-batch'),
+    path('review/session/', ReviewSessionView.as_view(), name='review-session'),
     path('stats/', StatsView.as_view(), name='stats'),
+    path('stats/levels/<int:level>/', MasteryLevelKanjiView.as_view(), name='stats-level-kanji'),
     path('kanji/', KanjiView.as_view(), name='kanji'),
+    path('kanji/export/', KanjiExportView.as_view(), name='kanji-export'),
+    path('kanji/search/', KanjiSearchView.as_view(), name='kanji-search'),
+    path('kanji/readings/', KanjiReadingLookupView.as_view(), name='kanji-readings'),
+    path('analyze/', TextAnalysisView.as_view(), name='analyze'),
+    path('health/', HealthView.as_view(), name='health'),
+    path('cache/', CacheStatsView.as_view(), name='cache-stats'),
 ]
 
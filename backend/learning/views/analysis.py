@@ -0,0 +1,43 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from ..services.text_analysis import text_index
+
+
+MAX_TEXTS = 50
+MAX_TOTAL_LENGTH = 500_000
+
+
+class TextAnalysisView(APIView):
+    """Find the catalog kanji and example words that appear in Japanese text"""
+    
+    def post(self, request):
+        """
+        Analyse {"text": "..."} or {"texts": ["...", ...]}. Each result lists the catalog kanji in
+        order of appearance with class level and mastery, kanji missing from the catalog,
+        and the example words found in the text.
+        """
+        if 'texts' in request.data:
+            texts = request.data.get('texts')
+        else:
+            texts = [request.data.get('text')]
+        
+        if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+            return Response({
+                'success': False,
+                'error': 'Pass the text to analyse as "text", or a list of texts as "texts".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(texts) > MAX_TEXTS:
+            return Response({
+                'success': False,
+                'error': f'Too many texts. At most {MAX_TEXTS} per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if sum(len(text) for text in texts) > MAX_TOTAL_LENGTH:
+            return Response({
+                'success': False,
+                'error': f'Text too long. At most {MAX_TOTAL_LENGTH} characters per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'results': text_index.analyze(texts)
+        }, status=status.HTTP_200_OK)
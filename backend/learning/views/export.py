@@ -0,0 +1,41 @@
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from ..services.export import EXPORT_FORMATS, iter_export, iter_gzip
+
+
+class KanjiExportView(View):
+    """
+    Stream the whole catalog with readings and examples.
+    A plain Django view: the body is streamed as it is read from the database,
+    so it bypasses DRF's (buffering) renderers.
+    """
+    content_types = {
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+    }
+    
+    def get(self, request):
+        """Export as ?format=ndjson (default) or ?format=csv, gzip-compressed with ?compress=gzip"""
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({
+                'error': f'Invalid format parameter. Must be one of: {", ".join(EXPORT_FORMATS)}.'
+            }, status=400)
+        compress = request.GET.get('compress')
+        if compress not in (None, '', 'gzip'):
+            return JsonResponse({
+                'error': 'Invalid compress parameter. Only gzip is supported.'
+            }, status=400)
+        
+        chunks = iter_export(export_format)
+        filename = f'kanji.{export_format}'
+        if compress:
+            response = StreamingHttpResponse(iter_gzip(chunks), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(
+                (chunk.encode('utf-8') for chunk in chunks),
+                content_type=self.content_types[export_format]
+            )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
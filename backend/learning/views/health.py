@@ -0,0 +1,25 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from ..cache import cache_stats
+from ..services.seeding import get_seed_state, is_seeded
+
+
+class HealthView(APIView):
+    """Report whether the kanji catalog has been seeded"""
+    
+    def get(self, request):
+        """Get readiness state; responds 503 until seeding has finished"""
+        ready = is_seeded()
+        return Response({
+            'ready': ready,
+            'seed': get_seed_state()
+        }, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class CacheStatsView(APIView):
+    """Report response cache hit/miss counters"""
+    
+    def get(self, request):
+        """Get this process's cache counters and the current data versions"""
+        return Response(cache_stats(), status=status.HTTP_200_OK)
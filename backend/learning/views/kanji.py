@@ -1,20 +1,23 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import transaction
 from ..models import Kanji, KanjiReview
-from ..serializers import KanjiSerializer
-from ..utils import auto_import_kanji_data, check_kanji_in_csv
+from ..cache import CATALOG, cached_data, get_version_states
+from ..conditional import catalog_validators, not_modified_response, set_validators
+from ..pagination import KanjiKeysetPagination
+from ..serializers import KanjiSerializer, kanji_values, serialize_kanji_rows
+from ..utils import check_kanji_in_csv
 
 
 class KanjiView(APIView):
     """Get all kanji and create new kanji"""
     
     def get(self, request):
-        """Get all kanji, optionally filtered by class"""
-        # Auto-import kanji from CSV if database is empty
-        if not Kanji.objects.exists():
-            auto_import_kanji_data(silent=True)
-        
+        """
+        Get all kanji, optionally filtered by class.
+        Pass `page_size` (and then the returned `next_cursor` as `cursor`) to fetch the catalog in pages.
+        """
         kanji_list = Kanji.objects.all()
         
         # Filter by class if provided
@@ -29,8 +32,25 @@ class KanjiView(APIView):
                     'error': 'Invalid class parameter. Must be a number between 1-6.'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = KanjiSerializer(kanji_list, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Clients holding current data get a 304 without any serialization work.
+        # Reading and example changes only show in the catalog's data version.
+        version_token, version_updated_at = get_version_states(CATALOG)[CATALOG]
+        etag, last_modified = catalog_validators(kanji_list, version_token, version_updated_at)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, etag, last_modified)
+        
+        def build():
+            rows = kanji_values(kanji_list)
+            paginator = KanjiKeysetPagination()
+            if paginator.is_requested(request):
+                page = paginator.paginate_queryset(rows, request, view=self)
+                return paginator.get_paginated_response(serialize_kanji_rows(page)).data
+            return serialize_kanji_rows(rows)
+        
+        data = cached_data('kanji', request.query_params.dict(), (CATALOG,), build, versions={CATALOG: version_token})
+        response = Response(data, status=status.HTTP_200_OK)
+        return set_validators(response, etag, last_modified)
     
     def post(self, request):
         """Add new kanji"""
@@ -49,10 +69,12 @@ class KanjiView(APIView):
         serializer = KanjiSerializer(data=request.data)
         
         if serializer.is_valid():
-            kanji = serializer.save()
-            
-            # Create initial review entry
-            KanjiReview.objects.get_or_create(kanji=kanji)
+            # The kanji, its review entry and their stats deltas (see signals) commit together
+            with transaction.atomic():
+                kanji = serializer.save()
+                
+                # Create initial review entry
+                KanjiReview.objects.get_or_create(kanji=kanji)
             
             response_serializer = KanjiSerializer(kanji)
             return Response({
@@ -1,39 +1,68 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
-from datetime import timedelta
-from ..models import Kanji, KanjiReview
-from ..serializers import KanjiSerializer
-from ..utils import auto_import_kanji_data
+from ..models import Kanji
+from ..serializers import kanji_values, serialize_kanji_rows
+from ..services.due_queue import due_queue
+from ..services.review_selector import DUE, FALLBACK, NEW, select_review_cards
+from ..services.review_session import InvalidSession, next_session_cards
+from ..services.reviews import (
+    APPLIED,
+    MAX_BATCH_SIZE,
+    ReviewConflict,
+    parse_response_time,
+    submit_review,
+    submit_review_batch,
+)
+
+
+MAX_REVIEW_LIMIT = 100
+DEFAULT_SESSION_SIZE = 20
+PRIORITY_NAMES = {DUE: 'due', NEW: 'new', FALLBACK: 'extra'}
+
+
+def review_cards(reviews, full_state=False):
+    """
+    Full kanji payloads plus review state for review rows, in the rows' order.
+    With `full_state`, cards also carry the review counters and queue priority.
+    """
+    kanji_ids = [review['kanji_id'] for review in reviews]
+    kanji_by_id = {
+        kanji['id']: kanji
+        for kanji in serialize_kanji_rows(kanji_values(Kanji.objects.filter(pk__in=kanji_ids)))
+    }
+    cards = []
+    for review in reviews:
+        kanji_data = kanji_by_id[review['kanji_id']]
+        kanji_data['next_review'] = review['next_review'].isoformat()
+        kanji_data['mastery_level'] = review['mastery_level']
+        if full_state:
+            kanji_data['review_count'] = review['review_count']
+            kanji_data['correct_count'] = review['correct_count']
+            kanji_data['last_reviewed'] = review['last_reviewed'].isoformat() if review['last_reviewed'] else None
+            kanji_data['priority'] = PRIORITY_NAMES[review['priority']]
+        cards.append(kanji_data)
+    return cards
 
 
 class ReviewView(APIView):
     """Get kanji for review and submit review results"""
     
     def get(self, request):
-        """Get kanji for review, optionally filtered by mastery level"""
-        # Auto-import kanji from CSV if database is empty
-        if not Kanji.objects.exists():
-            auto_import_kanji_data(silent=True)
-        
+        """
+        Get kanji for review, optionally filtered by mastery level.
+        Pass `limit` to get the next N cards in queue order as a list.
+        """
         # Get mastery level filter if provided
         mastery_level = request.query_params.get('mastery_level', None)
         # Get class level filter if provided
         class_level = request.query_params.get('class', None)
-        
-        # Get kanji that are due for review (next_review <= now)
-        # Or get kanji that haven't been reviewed yet
-        now = timezone.now()
-        
-        # Base queryset
-        reviews = KanjiReview.objects.all()
+        limit = request.query_params.get('limit', None)
         
         # Filter by class level if provided
         if class_level is not None:
             try:
                 class_level = int(class_level)
-                reviews = reviews.filter(kanji__class_level=class_level)
             except ValueError:
                 return Response({
                     'error': 'Invalid class parameter. Must be a number between 1-6.'
@@ -43,28 +72,26 @@ class ReviewView(APIView):
         if mastery_level is not None:
             try:
                 mastery_level = int(mastery_level)
-                reviews = reviews.filter(mastery_level=mastery_level)
             except ValueError:
                 return Response({
                     'error': 'Invalid mastery_level parameter. Must be a number.'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # First, try to get kanji that are due for review
-        review = reviews.filter(
-            next_review__lte=now
-        ).order_by('next_review').first()
-        
-        # If no kanji are due, get one that hasn't been reviewed yet
-        if not review:
-            review = reviews.filter(
-                review_count=0
-            ).first()
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if not 1 <= limit <= MAX_REVIEW_LIMIT:
+                return Response({
+                    'error': f'Invalid limit parameter. Must be a number between 1-{MAX_REVIEW_LIMIT}.'
+                }, status=status.HTTP_400_BAD_REQUEST)
         
-        # If still no kanji, get any kanji from the filtered set
-        if not review:
-            review = reviews.first()
+        # Due cards first (earliest next_review), then ones not reviewed yet, then any card
+        select = due_queue.select if due_queue.enabled() else select_review_cards
+        reviews = select(limit=limit or 1, class_level=class_level, mastery_level=mastery_level)
         
-        if not review:
+        if not reviews:
             level_msg = ''
             if mastery_level is not None:
                 level_msg = f' at mastery level {mastery_level}'
@@ -74,50 +101,109 @@ class ReviewView(APIView):
                 'error': f'No kanji available for review{level_msg}'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Serialize the kanji with all related data
-        serializer = KanjiSerializer(review.kanji)
-        kanji_data = serializer.data
-        kanji_data['next_review'] = review.next_review.isoformat()
-        kanji_data['mastery_level'] = review.mastery_level
-        
-        return Response(kanji_data, status=status.HTTP_200_OK)
+        cards = review_cards(reviews)
+        if limit is None:
+            return Response(cards[0], status=status.HTTP_200_OK)
+        return Response({
+            'count': len(cards),
+            'cards': cards
+        }, status=status.HTTP_200_OK)
     
     def post(self, request):
-        """Submit review result"""
+        """Submit review result (optionally with the answer's `response_time_ms`)"""
         kanji_id = request.data.get('kanji_id')
         result = request.data.get('result')  # 'correct', 'incorrect', 'hard'
         
         try:
-            kanji = Kanji.objects.get(id=kanji_id)
-            review, created = KanjiReview.objects.get_or_create(kanji=kanji)
-            
-            # Update review statistics
-            review.review_count += 1
-            review.last_reviewed = timezone.now()
-            
-            if result == 'correct':
-                review.correct_count += 1
-                review.mastery_level += 1
-                # Increase time until next review (spaced repetition)
-                days_until_review = min(30, review.mastery_level * 2)
-                review.next_review = timezone.now() + timedelta(days=days_until_review)
-            elif result == 'hard':
-                # Keep same level, review again soon
-                review.next_review = timezone.now() + timedelta(days=1)
-            else:  # incorrect
-                # Reset or decrease mastery level
-                review.mastery_level = max(0, review.mastery_level - 1)
-                review.next_review = timezone.now() + timedelta(days=1)
-            
-            review.save()
-            
+            # Safe against concurrent submits for the same card (double clicks, several devices)
+            review = submit_review(
+                kanji_id, result, response_time_ms=parse_response_time(request.data.get('response_time_ms'))
+            )
+        except ReviewConflict as e:
             return Response({
-                'success': True,
-                'message': f'Review submitted for kanji {kanji_id} with result: {result}'
-            }, status=status.HTTP_200_OK)
-        except Kanji.DoesNotExist:
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_409_CONFLICT)
+        except (TypeError, ValueError):
+            review = None
+        
+        if review is None:
             return Response({
                 'success': False,
                 'error': 'Kanji not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'success': True,
+            'message': f'Review submitted for kanji {kanji_id} with result: {result}'
+        }, status=status.HTTP_200_OK)
+
 
+class ReviewBatchView(APIView):
+    """Submit a whole review session at once"""
+    
+    def post(self, request):
+        """
+        Submit {"reviews": [{"kanji_id": 1, "result": "correct", "reviewed_at": "<ISO 8601>"}, ...]}.
+        All answers are applied in one transaction; each gets its own status
+        (applied, stale, not_found or invalid) in the response.
+        """
+        reviews = request.data.get('reviews')
+        if not isinstance(reviews, list) or not reviews:
+            return Response({
+                'success': False,
+                'error': 'Pass the review results as a non-empty list in "reviews".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(reviews) > MAX_BATCH_SIZE:
+            return Response({
+                'success': False,
+                'error': f'Too many reviews. At most {MAX_BATCH_SIZE} per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = submit_review_batch(reviews)
+        return Response({
+            'success': True,
+            'applied': sum(1 for item in results if item['status'] == APPLIED),
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
+class ReviewSessionView(APIView):
+    """Prefetch the next cards of a review session in one round trip"""
+    
+    def get(self, request):
+        """
+        Get the next `limit` cards (default 20) with readings, examples and review state.
+        The response's `session` token goes back as `?session=` for the following batch, so
+        cards already served in this session are not handed out again. A new session takes the
+        `class` and `mastery_level` filters; a continued one keeps the filters it started with.
+        """
+        params = {}
+        for name, param in (('limit', 'limit'), ('class_level', 'class'), ('mastery_level', 'mastery_level')):
+            value = request.query_params.get(param)
+            if value is not None:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    return Response({
+                        'error': f'Invalid {param} parameter. Must be a number.'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+        limit = params.pop('limit', DEFAULT_SESSION_SIZE)
+        if not 1 <= limit <= MAX_REVIEW_LIMIT:
+            return Response({
+                'error': f'Invalid limit parameter. Must be a number between 1-{MAX_REVIEW_LIMIT}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            session, reviews = next_session_cards(limit, request.query_params.get('session'), **params)
+        except InvalidSession:
+            return Response({
+                'error': 'Invalid or expired session. Start a new one without the session parameter.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        cards = review_cards(reviews, full_state=True) if reviews else []
+        return Response({
+            'session': session,
+            'count': len(cards),
+            'cards': cards
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,108 @@
+import re
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from ..services.reading_index import EXACT, MATCH_MODES, reading_index
+from ..services.search_index import meaning_index
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class KanjiSearchView(APIView):
+    """Search kanji by English meaning"""
+    
+    def get(self, request):
+        """
+        Rank kanji whose meaning, or the meaning of one of their example words, contains every
+        word of `q`. Every word may be a prefix ("wat" finds "water"). Pass `limit` for more results.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({
+                'success': False,
+                'error': 'Missing search query. Pass it as ?q=...'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_LIMIT:
+            return Response({
+                'success': False,
+                'error': f'Invalid limit parameter. Must be a number between 1-{MAX_LIMIT}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        total, results = meaning_index.search(query, limit=limit)
+        return Response({
+            'query': query,
+            'count': total,
+            'results': results
+        }, status=status.HTTP_200_OK)
+
+
+DEFAULT_READING_LIMIT = 50
+MAX_READING_LIMIT = 500
+MAX_READING_QUERIES = 100
+READING_QUERY_SEPARATORS = re.compile(r'[,、・\s]+')
+
+
+class KanjiReadingLookupView(APIView):
+    """Find kanji by reading, written in hiragana, katakana or romaji"""
+    
+    def get(self, request):
+        """
+        Look up one or more readings: repeat `q` or separate them with commas (?q=ニチ,ひ).
+        `match=prefix` also returns readings that start with the query.
+        """
+        queries = []
+        for value in request.query_params.getlist('q'):
+            queries += [query for query in READING_QUERY_SEPARATORS.split(value) if query]
+        return self.lookup(queries, request.query_params)
+    
+    def post(self, request):
+        """Batch lookup: {"readings": ["にち", "hi", ...], "match": "exact", "limit": 50}"""
+        queries = request.data.get('readings')
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            return Response({
+                'success': False,
+                'error': 'Pass the readings to look up as a list of strings in "readings".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return self.lookup([query for query in queries if query.strip()], request.data)
+    
+    def lookup(self, queries, params):
+        if not queries:
+            return Response({
+                'success': False,
+                'error': 'Missing reading. Pass it as ?q=...'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(queries) > MAX_READING_QUERIES:
+            return Response({
+                'success': False,
+                'error': f'Too many readings. At most {MAX_READING_QUERIES} per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        match = params.get('match', EXACT)
+        if match not in MATCH_MODES:
+            return Response({
+                'success': False,
+                'error': f'Invalid match parameter. Must be one of: {", ".join(MATCH_MODES)}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = int(params.get('limit', DEFAULT_READING_LIMIT))
+        except (TypeError, ValueError):
+            limit = 0
+        if not 1 <= limit <= MAX_READING_LIMIT:
+            return Response({
+                'success': False,
+                'error': f'Invalid limit parameter. Must be a number between 1-{MAX_READING_LIMIT}.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = reading_index.lookup(queries, match=match, limit=limit)
+        return Response({
+            'match': match,
+            'results': results
+        }, status=status.HTTP_200_OK)
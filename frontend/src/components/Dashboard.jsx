@@ -15,6 +15,7 @@ function Dashboard() {
     mastery_levels: [],
   })
   const [expandedLevel, setExpandedLevel] = useState(null)
+  const [levelKanji, setLevelKanji] = useState({})
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
 
@@ -43,6 +44,7 @@ function Dashboard() {
       setError(null)
       const data = await kanjiAPI.getStats()
       setStats(data)
+      setLevelKanji({})
     } catch (err) {
       const errorMessage = err.response?.data?.error || err.message || 'Failed to load statistics'
       setError(errorMessage)
@@ -58,6 +60,23 @@ function Dashboard() {
     }
   }
 
+  const toggleLevel = async (level) => {
+    if (expandedLevel === level) {
+      setExpandedLevel(null)
+      return
+    }
+    setExpandedLevel(level)
+    if (levelKanji[level]) {
+      return
+    }
+    try {
+      const data = await kanjiAPI.getLevelKanji(level)
+      setLevelKanji((loaded) => ({ ...loaded, [level]: data.kanji }))
+    } catch (err) {
+      console.error('Level kanji loading error:', err)
+    }
+  }
+
   if (loading) {
     return (
       <div className="dashboard">
@@ -136,7 +155,9 @@ function Dashboard() {
           <div className="streak-content">
             <div className="streak-value">{stats.streak}</div>
             <div className="streak-label">Day Streak</div>
-            <div className="streak-subtitle">Keep it up!</div>
+            <div className="streak-subtitle">
+              {stats.accuracy_7d != null ? `${stats.accuracy_7d}% correct this week` : 'Keep it up!'}
+            </div>
           </div>
         </div>
       </div>
@@ -153,7 +174,7 @@ function Dashboard() {
               >
                 <div 
                   className="mastery-level-header"
-                  onClick={() => setExpandedLevel(expandedLevel === levelData.level ? null : levelData.level)}
+                  onClick={() => toggleLevel(levelData.level)}
                 >
                   <div className="level-info">
                     <span className="level-label">
@@ -176,7 +197,7 @@ function Dashboard() {
                 </div>
                 {expandedLevel === levelData.level && (
                   <div className="kanji-list">
-                    {levelData.kanji.map((kanji) => (
+                    {(levelKanji[levelData.level] || []).map((kanji) => (
                       <div key={kanji.id} className="kanji-item">
                         <span className="kanji-character">{kanji.character}</span>
                         <span className="kanji-meaning">{kanji.meaning}</span>
@@ -40,6 +40,12 @@ export const kanjiAPI = {
     return response.data
   },
 
+  // Get the kanji at one mastery level (loaded when a dashboard level is expanded)
+  getLevelKanji: async (level) => {
+    const response = await api.get(`/stats/levels/${level}/`)
+    return response.data
+  },
+
   // Get all kanji
   getAllKanji: async () => {
     const response = await api.get('/kanji/')